@@ -1,7 +1,8 @@
 """Aggregators are class that reads a bunch of data and makes sense of it
 """
 import abc
-from typing import Iterable, Optional
+from typing import Iterable, List, Optional
+from mycollect.storage import ItemFilter
 from mycollect.structures import MyCollectItem
 
 
@@ -41,3 +42,21 @@ class Aggregator(metaclass=abc.ABCMeta):  # pylint: disable= R0903
             str: notification channel name
         """
         return self._notify
+
+    @property
+    def item_filter(self) -> Optional[ItemFilter]:
+        """Gets the predicates the storage applies to the items it reads
+
+        Returns:
+            ItemFilter: predicates, None to read all items
+        """
+        return None
+
+    @property
+    def fields(self) -> Optional[List[str]]:
+        """Gets the extra fields required by this aggregator
+
+        Returns:
+            List[str]: extra fields, None to read them all
+        """
+        return None
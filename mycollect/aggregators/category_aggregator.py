@@ -2,9 +2,11 @@
 The dummy aggregator reads data from the last day and elect the top n articles per category
 """
 from collections import defaultdict
-from typing import Iterable
+from typing import Iterable, List, Optional
 
 from mycollect.aggregators import Aggregator
+from mycollect.canonical import UrlCanonicalizer
+from mycollect.storage import ItemFilter
 from mycollect.structures import MyCollectItem
 from mycollect.logger import create_logger
 
@@ -13,9 +15,10 @@ class CategoryAggregator(Aggregator):  # pylint: disable=R0903
     """Aggregates item to a basic category list with top x items
     """
 
-    def __init__(self, top_articles=3, **kwargs):
+    def __init__(self, top_articles=3, canonical: dict = None, **kwargs):
         super().__init__(**kwargs)
         self._top_articles = top_articles
+        self._canonicalizer = UrlCanonicalizer(**(canonical or {}))
         self._logger = create_logger()
 
     def aggregates(self, items: Iterable[MyCollectItem]):
@@ -23,17 +26,18 @@ class CategoryAggregator(Aggregator):  # pylint: disable=R0903
         item_count = 0
         for mycollect_item in self._filter_items(items):
             item_count += 1
-            if mycollect_item.url not in categories[mycollect_item.category]:
-                categories[mycollect_item.category][mycollect_item.url] = []
-            categories[mycollect_item.category][mycollect_item.url].append(
+            key = self._canonicalizer.key(mycollect_item.url)
+            if key not in categories[mycollect_item.category]:
+                categories[mycollect_item.category][key] = []
+            categories[mycollect_item.category][key].append(
                 mycollect_item)
         logger = self._logger.bind(mycollect_items=item_count)
         results = {}
         for category, url_dict in sorted(categories.items()):
             category_items = []
-            for url, mycollect_items in url_dict.items():
+            for mycollect_items in url_dict.values():
                 item = {
-                    "url": url,
+                    "url": self._canonicalizer.canonicalize(mycollect_items[0].url),
                     "count": len(mycollect_items),
                     "text": mycollect_items[0].text
                 }
@@ -44,6 +48,14 @@ class CategoryAggregator(Aggregator):  # pylint: disable=R0903
         logger.info("dummy aggregation done", categories=len(results))
         return results
 
+    @property
+    def item_filter(self) -> Optional[ItemFilter]:
+        return ItemFilter(has_article=True)
+
+    @property
+    def fields(self) -> Optional[List[str]]:
+        return ["article"]
+
     @staticmethod
     def _filter_items(items: Iterable[MyCollectItem]) -> Iterable[MyCollectItem]:
         for item in items:
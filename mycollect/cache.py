@@ -1,10 +1,21 @@
 """Generic key value cache
 """
 import abc
+import base64
+from collections import OrderedDict
 import dbm
+import hashlib
+import json
 import os
-from typing import Optional
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
 import tempfile
+import zlib
+
+from mycollect.logger import create_logger
+from mycollect.utils import get_class
 
 
 class MyCache(metaclass=abc.ABCMeta):
@@ -40,6 +51,10 @@ class MyCache(metaclass=abc.ABCMeta):
             Optional[str]: value
         """
 
+    def close(self) -> None:
+        """Releases the resources held by the cache
+        """
+
 
 class DbmCache(MyCache):
 
@@ -60,3 +75,322 @@ class DbmCache(MyCache):
         if value is not None:
             return value.decode()
         return value
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class SQLiteCache(MyCache):  # pylint:disable=too-many-instance-attributes
+
+    """A persistent cache with sqlite backend, bounded in size and time.
+    Expired and least recently used entries are removed by a background compaction
+    """
+
+    def __init__(self, name: str, working_folder: str = "cache",  # pylint:disable=too-many-arguments
+                 max_size: int = 512 * 1024 * 1024, ttl: float = 30 * 24 * 3600,
+                 compaction_interval: float = 300):
+        """SQLiteCache ctor
+
+        Args:
+            name (str): name of this cache, and of the database file
+            working_folder (str, optional): folder of the database file. Defaults to "cache".
+            max_size (int, optional): maximum size of the keys and values. Defaults to 512MiB.
+            ttl (float, optional): seconds an entry is kept. Defaults to 30 days.
+            compaction_interval (float, optional): seconds between two compactions.
+                Defaults to 300.
+        """
+        super().__init__(name)
+        os.makedirs(working_folder, exist_ok=True)
+        self._max_size = max_size
+        self._ttl = ttl
+        self._compaction_interval = compaction_interval
+        self._logger = create_logger()
+        self._connection = sqlite3.connect(
+            os.path.join(working_folder, name + ".sqlite"), check_same_thread=False)
+        self._connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT,"
+                " size INTEGER, created REAL, accessed REAL)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._lock = threading.Lock()
+        self._touched: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def set_item(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?)", (key, value, len(key) + len(value), now, now))
+
+    def get_item(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] + self._ttl < time.time():
+                return None
+            self._touched.add(key)
+        return row[0]
+
+    def compact(self) -> None:
+        """Removes the expired entries, then the least recently used ones
+        while the cache is above its maximum size
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            touched, self._touched = self._touched, set()
+            self._connection.executemany(
+                "UPDATE entries SET accessed = ? WHERE key = ?", ((now, key) for key in touched))
+            expired = self._connection.execute(
+                "DELETE FROM entries WHERE created < ?", (now - self._ttl,)).rowcount
+            size = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            evicted = 0
+            while size > self._max_size:
+                rows = self._connection.execute(
+                    "SELECT key, size FROM entries ORDER BY accessed LIMIT 500").fetchall()
+                for key, entry_size in rows:
+                    if size <= self._max_size:
+                        break
+                    self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    size -= entry_size
+                    evicted += 1
+        with self._lock:
+            self._connection.execute("PRAGMA incremental_vacuum")
+            self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._logger.debug("cache compacted", cache=self._name, expired=expired,
+                           evicted=evicted, size=size)
+
+    def close(self) -> None:
+        """Stops the compaction, compacts and closes the database
+        """
+        self._stop.set()
+        self._thread.join()
+        self.compact()
+        self._connection.close()
+
+    def _run(self):
+        while not self._stop.wait(self._compaction_interval):
+            try:
+                self.compact()
+            except sqlite3.Error as err:
+                self._logger.exception(err)
+
+
+class LruCache(MyCache):
+
+    """A size bounded in memory cache, with a time to live per entry,
+    in front of an optional persistent cache
+    """
+
+    def __init__(self, name: str, max_items: int = 10000, ttl: float = 3600,
+                 backend: MyCache = None):
+        """LruCache ctor
+
+        Args:
+            name (str): name of this cache
+            max_items (int, optional): maximum entries kept in memory. Defaults to 10000.
+            ttl (float, optional): seconds an entry stays in memory. Defaults to 3600.
+            backend (MyCache, optional): persistent cache. Defaults to None.
+        """
+        super().__init__(name)
+        self._max_items = max_items
+        self._ttl = ttl
+        self._backend = backend
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "backend_hits": 0,
+                          "evictions": 0, "expirations": 0}
+
+    def set_item(self, key: str, value: str) -> None:
+        if self._backend:
+            self._backend.set_item(key, value)
+        self._set_local(key, value)
+
+    def get_item(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+        if self._backend is None:
+            return None
+        value = self._backend.get_item(key)
+        if value is not None:
+            with self._lock:
+                self._counters["backend_hits"] += 1
+            self._set_local(key, value)
+        return value
+
+    def close(self) -> None:
+        if self._backend:
+            self._backend.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Gets the counters of this cache
+
+        Returns:
+            Dict[str, int]: hits, misses, backend hits, evictions, expirations
+                and entries in memory
+        """
+        with self._lock:
+            return dict(self._counters, items=len(self._entries))
+
+    def _set_local(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_items:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+
+class ContentAddressedCache(MyCache):
+
+    """Stores each distinct value once, compressed, under the hash of its content.
+    The keys only hold a pointer to the value
+    """
+
+    POINTER_PREFIX = "@"
+    VALUE_PREFIX = "value:"
+
+    def __init__(self, name: str, backend: MyCache, compression_level: int = 6):
+        """ContentAddressedCache ctor
+
+        Args:
+            name (str): name of this cache
+            backend (MyCache): cache storing the pointers and the values
+            compression_level (int, optional): zlib compression level. Defaults to 6.
+        """
+        super().__init__(name)
+        self._backend = backend
+        self._compression_level = compression_level
+
+    def set_item(self, key: str, value: str) -> None:
+        digest = hashlib.sha256(value.encode()).hexdigest()
+        value_key = self.VALUE_PREFIX + digest
+        if self._backend.get_item(value_key) is None:
+            compressed = zlib.compress(value.encode(), self._compression_level)
+            self._backend.set_item(value_key, base64.b85encode(compressed).decode())
+        self._backend.set_item(key, self.POINTER_PREFIX + digest)
+
+    def get_item(self, key: str) -> Optional[str]:
+        pointer = self._backend.get_item(key)
+        if pointer is None or not pointer.startswith(self.POINTER_PREFIX):
+            # values stored before the cache was content addressed
+            return pointer
+        compressed = self._backend.get_item(self.VALUE_PREFIX + pointer[len(self.POINTER_PREFIX):])
+        if compressed is None:
+            return None
+        return zlib.decompress(base64.b85decode(compressed)).decode()
+
+    def close(self) -> None:
+        self._backend.close()
+
+
+class FailureCache():
+
+    """Remembers the failures per key in a cache, a key is skipped for a delay
+    that doubles with each consecutive failure
+    """
+
+    def __init__(self, cache: MyCache, base_delay: float = 600,  # pylint:disable=too-many-arguments
+                 max_delay: float = 7 * 24 * 3600, min_failures: int = 1,
+                 prefix: str = "failure:"):
+        """FailureCache ctor
+
+        Args:
+            cache (MyCache): cache storing the failures
+            base_delay (float, optional): seconds a key is skipped after its first failure.
+                Defaults to 600.
+            max_delay (float, optional): maximum seconds a key is skipped. Defaults to 7 days.
+            min_failures (int, optional): consecutive failures before the key is skipped.
+                Defaults to 1.
+            prefix (str, optional): prefix of the keys in the cache. Defaults to "failure:".
+        """
+        self._cache = cache
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._min_failures = min_failures
+        self._prefix = prefix
+
+    def get_failure(self, key: str) -> Optional[dict]:
+        """Gets the last failure of the key if the key must be skipped
+
+        Args:
+            key (str): key
+
+        Returns:
+            Optional[dict]: reason, consecutive failures and retry time,
+                None if the key can be processed
+        """
+        failure = self._get(key)
+        if failure["failures"] >= self._min_failures and failure["retry_at"] > time.time():
+            return failure
+        return None
+
+    def record_failure(self, key: str, reason: str) -> dict:
+        """Records a new failure of the key
+
+        Args:
+            key (str): key
+            reason (str): reason of the failure
+
+        Returns:
+            dict: reason, consecutive failures and retry time
+        """
+        failures = self._get(key)["failures"] + 1
+        retry_at = 0.0
+        if failures >= self._min_failures:
+            retry_at = time.time() + min(
+                self._base_delay * 2 ** (failures - self._min_failures), self._max_delay)
+        failure = {"reason": reason, "failures": failures, "retry_at": retry_at}
+        self._cache.set_item(self._prefix + key, json.dumps(failure))
+        return failure
+
+    def record_success(self, key: str) -> None:
+        """Resets the consecutive failures of the key
+
+        Args:
+            key (str): key
+        """
+        if self._get(key)["failures"]:
+            self._cache.set_item(self._prefix + key, json.dumps(
+                {"reason": None, "failures": 0, "retry_at": 0}))
+
+    def _get(self, key: str) -> dict:
+        value = self._cache.get_item(self._prefix + key)
+        if value:
+            return json.loads(value)
+        return {"reason": None, "failures": 0, "retry_at": 0}
+
+
+def create_cache(name: str, configuration: Optional[dict] = None,
+                 working_folder: str = None) -> MyCache:
+    """Creates the cache defined by configuration
+
+    Args:
+        name (str): name of the cache
+        configuration (dict, optional): type and args of the cache,
+            a backend argument is created the same way. Defaults to a DbmCache.
+        working_folder (str, optional): working folder of the default DbmCache
+
+    Returns:
+        MyCache: the cache
+    """
+    if not configuration:
+        return DbmCache(name, working_folder)
+    args = dict(configuration.get("args", {}))
+    if "backend" in args:
+        args["backend"] = create_cache(name, args["backend"], working_folder)
+    return get_class(configuration["type"])(name, **args)
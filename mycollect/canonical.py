@@ -0,0 +1,96 @@
+"""Canonical form of the urls, the same page shared with tracking parameters,
+fragments or a different host casing converges on one url
+"""
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+DEFAULT_STRIPPED_PARAMS = [
+    "utm_*", "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid",
+    "ref_src", "ref_url", "_ga", "cmpid", "ocid", "ncid", "s_cid", "__twitter_impression"
+]
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class UrlCanonicalizer():
+
+    """Removes the tracking parameters and the fragment of the urls,
+    parameters can be stripped per domain
+    """
+
+    def __init__(self, strip_params: List[str] = None,
+                 domain_rules: Dict[str, List[str]] = None):
+        """UrlCanonicalizer ctor
+
+        Args:
+            strip_params (List[str], optional): patterns of the query parameters removed
+                from all the urls. Defaults to DEFAULT_STRIPPED_PARAMS.
+            domain_rules (Dict[str, List[str]], optional): patterns of the query parameters
+                removed from the urls of a domain and its subdomains, "*" removes the whole query.
+                Defaults to no rule.
+        """
+        self._strip_params = strip_params if strip_params is not None \
+            else DEFAULT_STRIPPED_PARAMS
+        self._domain_rules = {domain.lower(): patterns
+                              for domain, patterns in (domain_rules or {}).items()}
+
+    def canonicalize(self, url: Optional[str]) -> Optional[str]:
+        """Gets the canonical form of an url, the url can still be downloaded
+
+        Args:
+            url (str): url
+
+        Returns:
+            str: url with a lower case scheme and host, without default port,
+                stripped parameters and fragment. The url itself if it is not an http url
+        """
+        parts = self._canonical_parts(url)
+        return urlunsplit(parts) if parts else url
+
+    def key(self, url: Optional[str]) -> Optional[str]:
+        """Gets the key identifying the page of an url, used to group and cache the urls
+
+        Args:
+            url (str): url
+
+        Returns:
+            str: canonical url without www prefix and trailing slash
+        """
+        parts = self._canonical_parts(url)
+        if not parts:
+            return url
+        scheme, netloc, path, query, fragment = parts
+        if netloc.startswith("www."):
+            netloc = netloc[4:]
+        return urlunsplit((scheme, netloc, path.rstrip("/") or "/", query, fragment))
+
+    def _canonical_parts(self, url: Optional[str]) -> Optional[Tuple[str, str, str, str, str]]:
+        if not url:
+            return None
+        try:
+            parts = urlsplit(url.strip())
+            port = parts.port
+        except ValueError:
+            return None
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            return None
+        netloc = parts.hostname
+        if port and port != DEFAULT_PORTS[scheme]:
+            netloc += f":{port}"
+        patterns = self._strip_params + self._domain_patterns(parts.hostname)
+        query = []
+        if "*" not in patterns:
+            query = sorted((name, value)
+                           for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                           if not any(fnmatchcase(name.lower(), pattern) for pattern in patterns))
+        return scheme, netloc, parts.path or "/", urlencode(query), ""
+
+    def _domain_patterns(self, hostname: str) -> List[str]:
+        patterns: List[str] = []
+        for domain, domain_patterns in self._domain_rules.items():
+            if hostname == domain or hostname.endswith("." + domain):
+                patterns.extend(domain_patterns)
+        return patterns
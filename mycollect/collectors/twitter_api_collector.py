@@ -9,7 +9,7 @@ from TwitterAPI import TwitterAPI  # type:ignore
 from mycollect.collectors import Collector
 from mycollect.logger import create_logger
 from mycollect.structures import MyCollectItem
-from mycollect.utils import unshorten_url
+from mycollect.unshortener import AsyncUnshortener, Unshortener, default_unshortener
 
 
 @dataclass
@@ -55,7 +55,8 @@ class TwitterAPICollector(Collector):
 
     BASE_RULES = " has:links"
 
-    def __init__(self, consumer_key, consumer_secret, languages, track):
+    def __init__(self, consumer_key, consumer_secret,  # pylint:disable=too-many-arguments
+                 languages, track, unshortener: dict = None, resolver: dict = None):
         super().__init__()
         self._logger = create_logger().bind(collector='twitter')
         self._base_rule = TwitterAPICollector.BASE_RULES
@@ -64,6 +65,8 @@ class TwitterAPICollector(Collector):
             lang_rule.append("lang:" + language)
         self._base_rule += " (" + " OR ".join(lang_rule) + ")"
         self._track = track
+        self._unshortener = Unshortener(**(unshortener or {}))
+        self._resolver = AsyncUnshortener(self._unshortener, self.emit, **(resolver or {}))
         self._thread = None
         self._api = TwitterAPI(consumer_key, consumer_secret,
                                auth_type='oAuth2', api_version='2')
@@ -99,7 +102,7 @@ class TwitterAPICollector(Collector):
         try:
             if self._thread:
                 self._logger.info("stopping collection")
-                self.stop()
+                self._stop_stream()
                 self._logger.info("collection stopped")
             self._twitter_delays.update_reconnection_attempt()
             self._register_rules()
@@ -120,8 +123,8 @@ class TwitterAPICollector(Collector):
             })
             for item in self._response:
                 self._twitter_delays.update_tweet_received()
-                my_collect_item = self.data_to_my_collect_item(item)
-                self.emit(my_collect_item)
+                # every item goes through the resolver, the pipeline is called from its thread only
+                self._resolver.submit(self.data_to_my_collect_item(item, resolve=False))
                 if not self._thread:
                     break
             logger.info("closing twitter stream")
@@ -130,11 +133,16 @@ class TwitterAPICollector(Collector):
             logger.exception(err)
 
     @staticmethod
-    def data_to_my_collect_item(data: dict) -> MyCollectItem:
+    def data_to_my_collect_item(data: dict, unshortener: Unshortener = None,
+                                resolve: bool = True) -> MyCollectItem:
         """Transform a tweet to a MyCollectItem
 
         Args:
             data (dict): tweet
+            unshortener (Unshortener, optional): resolves the url of the tweet.
+                Defaults to the shared unshortener.
+            resolve (bool, optional): resolves the url of the tweet,
+                otherwise the url is kept as is. Defaults to True.
 
         Returns:
             MyCollectItem: my collect item
@@ -147,7 +155,7 @@ class TwitterAPICollector(Collector):
 
         try:
             url = data["data"]["entities"]["urls"][0]["expanded_url"]
-            item.url = unshorten_url(url)
+            item.url = (unshortener or default_unshortener()).unshorten(url) if resolve else url
         except KeyError as err:
             item.extra["tweet_error_url"] = f"Key missing {err}"
         except IndexError:
@@ -176,10 +184,16 @@ class TwitterAPICollector(Collector):
         self._logger.info("rules added", rules=response.text)
 
     def stop(self):
-        """Stops the twitter stream
+        """Stops the twitter stream, then resolves and emits the pending items
         """
+        self._stop_stream()
+        self._resolver.close()
+
+    def _stop_stream(self):
         local_thread = self._thread
         self._thread = None
+        if not local_thread:
+            return
         self._response.response.raw.read()
         self._response.close()
         local_thread.join()
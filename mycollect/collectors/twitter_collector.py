@@ -10,7 +10,8 @@ from tweepy import Stream  # type: ignore
 from mycollect.collectors import Collector
 from mycollect.logger import create_logger
 from mycollect.structures import MyCollectItem
-from mycollect.utils import unshorten_url
+from mycollect.track_matcher import TrackMatcher
+from mycollect.unshortener import AsyncUnshortener, Unshortener
 
 
 class TwitterCollector(Stream, Collector):  # pylint:disable=too-many-instance-attributes
@@ -18,7 +19,8 @@ class TwitterCollector(Stream, Collector):  # pylint:disable=too-many-instance-a
     """
 
     def __init__(self, consumer_key, consumer_secret,  # pylint:disable=too-many-arguments
-                 access_token, access_secret, languages, low_priority_url, track):
+                 access_token, access_secret, languages, low_priority_url, track,
+                 unshortener: dict = None, resolver: dict = None):
         super().__init__(consumer_key=consumer_key, consumer_secret=consumer_secret,
                          access_token=access_token, access_token_secret=access_secret)
         self._logger = create_logger().bind(collector='twitter')
@@ -27,6 +29,9 @@ class TwitterCollector(Stream, Collector):  # pylint:disable=too-many-instance-a
         self._last_data = time.time()
         self._timer_counter = 1
         self._track, self._filters = self.parse_track(track)
+        self._matcher = TrackMatcher(self._track, self._filters)
+        self._unshortener = Unshortener(**(unshortener or {}))
+        self._resolver = AsyncUnshortener(self._unshortener, self.emit, **(resolver or {}))
         self._exit = False
 
     def start(self):
@@ -60,13 +65,15 @@ class TwitterCollector(Stream, Collector):  # pylint:disable=too-many-instance-a
         if not self._exit:
             self._exit = True
             self.disconnect()
+            self._resolver.close()
 
     def on_data(self, raw_data):
         try:
             self._last_data = time.time()
             self._timer_counter = 1
             loaded_tweet = json.loads(raw_data)
-            category = self.get_category(loaded_tweet)
+            category, filtered = self._matcher.resolve(
+                self.get_text_for_category_selection(loaded_tweet), loaded_tweet.get("text", ""))
             retweet = loaded_tweet.get("retweeted_status", None)
             if retweet is not None:
                 url = self.get_url_from_tweet(loaded_tweet["retweeted_status"])
@@ -74,20 +81,15 @@ class TwitterCollector(Stream, Collector):  # pylint:disable=too-many-instance-a
                     url = self.get_url_from_tweet(loaded_tweet)
             else:
                 url = self.get_url_from_tweet(loaded_tweet)
-            if url:
-                try:
-                    url = unshorten_url(url)
-                except Exception as err:
-                    self._logger.exception(err)
-                    raise
-
-            if url and category and not self.match_filter(category, loaded_tweet.get("text", "")):
+            if url and category and not filtered:
                 item = MyCollectItem(provider="twitter",
                                      category=category,
                                      text=loaded_tweet.get("text", None),
                                      url=url)
                 item.extra["tweet"] = loaded_tweet
-                self.emit(item)
+                if urlparse(url).netloc in self._low_priority_url:
+                    item.low_priority = True
+                self._resolver.submit(item)
         except BaseException as err:  # pylint:disable=broad-except
             self._logger.error(f"on_data unexpected error: {err}")
             self._logger.debug(err, exception=err)
@@ -112,22 +114,7 @@ class TwitterCollector(Stream, Collector):  # pylint:disable=too-many-instance-a
         Returns:
             str -- category of the tweet
         """
-        best_track: Optional[Tuple[str, int]] = None
-        full_text = self.get_text_for_category_selection(tweet).lower()
-        for track in self._track:
-            words = track.split()
-            i = len(words)
-            for word in words:
-                if word in full_text:
-                    i -= 1
-            if i == 0:
-                if best_track is None:
-                    best_track = (track, len(words))
-                elif best_track[1] < len(words):  # pylint: disable=unsubscriptable-object
-                    best_track = (track, len(words))
-        if best_track:
-            return best_track[0]
-        return None
+        return self._matcher.best_track(self.get_text_for_category_selection(tweet))
 
     def get_url_from_tweet(self, tweet: dict) -> Optional[str]:
         """Retrieves the best url from the tweet
@@ -232,11 +219,7 @@ class TwitterCollector(Stream, Collector):  # pylint:disable=too-many-instance-a
         Returns:
             bool: True if it matches a filter, False otherwise
         """
-        lower_text = text.lower()
-        for cat_filter in self._filters.get(category, []):
-            if cat_filter in lower_text:
-                return True
-        return False
+        return self._matcher.match_filter(category, text)
 
     @staticmethod
     def parse_track(track: List[str]) -> Tuple[List[str], Dict[str, List[str]]]:
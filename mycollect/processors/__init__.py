@@ -2,9 +2,17 @@
     Processors will update the mycollectitem through the pipeline
 """
 import abc
-from typing import List, Optional
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
 from mycollect.structures import MyCollectItem
 from mycollect.logger import create_logger
+from mycollect.stats import StageStats
+from mycollect.utils import get_object_fqdn
+
+
+ErrorCallback = Optional[Callable[[MyCollectItem, Exception], None]]
 
 
 class Processor(metaclass=abc.ABCMeta):  # pylint:disable=R0903
@@ -17,22 +25,161 @@ class Processor(metaclass=abc.ABCMeta):  # pylint:disable=R0903
             Updates the current MyCollectItem, return None to drop this item
         """
 
+    def update_items(self, items: List[MyCollectItem],
+                     on_error: ErrorCallback = None) -> List[MyCollectItem]:
+        """
+            Updates a batch of MyCollectItem, the dropped items are not returned.
+            Defaults to update_item on each item, an item raising an error is kept unchanged
+            and given to on_error with the error
+        """
+        new_items = []
+        for item in items:
+            try:
+                new_item = self.update_item(item)
+            except Exception as err:  # pylint:disable=broad-except
+                create_logger().exception(err)
+                if on_error:
+                    on_error(item, err)
+                new_item = item
+            if new_item:
+                new_items.append(new_item)
+        return new_items
+
+    def set_forward(self, forward: Callable[[MyCollectItem], Optional[MyCollectItem]]) -> None:
+        """
+            Sets the callable running the rest of the pipeline,
+            processors completing the items in the background return None
+            from update_item and forward the items once completed
+        """
+
+    def stats(self) -> dict:
+        """
+            Gets the counters specific to the processor
+        """
+        return {}
+
+    def close(self) -> None:
+        """
+            Releases the resources held by the processor
+        """
+
+
+class MicroBatcher():
+
+    """Groups the items into batches, a batch is sent when it reaches its size
+    or when its first item waited for the maximum latency
+    """
+
+    def __init__(self, callback: Callable[[List[MyCollectItem]], Any],
+                 batch_size: int = 100, max_latency: float = 0.1):
+        """MicroBatcher ctor
+
+        Args:
+            callback (Callable[[List[MyCollectItem]], Any]): receives the batches
+            batch_size (int, optional): maximum items per batch. Defaults to 100.
+            max_latency (float, optional): maximum seconds an item waits for its batch.
+                Defaults to 0.1.
+        """
+        self._callback = callback
+        self._batch_size = batch_size
+        self._max_latency = max_latency
+        self._logger = create_logger()
+        self._pending: List[MyCollectItem] = []
+        self._first_at = 0.0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, item: MyCollectItem) -> None:
+        """Adds an item to the current batch, blocks while ten batches are waiting
+
+        Args:
+            item (MyCollectItem): item
+        """
+        with self._condition:
+            while len(self._pending) >= 10 * self._batch_size:
+                self._condition.wait()
+            self._pending.append(item)
+            if len(self._pending) == 1:
+                self._first_at = time.monotonic()
+                self._condition.notify_all()
+            elif len(self._pending) >= self._batch_size:
+                self._condition.notify_all()
+
+    def close(self) -> None:
+        """Sends the pending items and stops the batcher
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and len(self._pending) < self._batch_size:
+                    if not self._pending:
+                        self._condition.wait()
+                        continue
+                    remaining = self._first_at + self._max_latency - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._pending:
+                    return
+                batch = self._pending[:self._batch_size]
+                del self._pending[:self._batch_size]
+                self._first_at = time.monotonic()
+                self._condition.notify_all()
+            try:
+                self._callback(batch)
+            except Exception as err:  # pylint:disable=broad-except
+                self._logger.exception(err)
+
 
 class PipelineProcessor(Processor):
     """Pipeline that manages processors
     """
 
-    def __init__(self):
+    def __init__(self, batch_size: int = 1, batch_latency: float = 0.1):
+        """PipelineProcessor ctor
+
+        Args:
+            batch_size (int, optional): items are grouped in batches of this size
+                and processed in the background by update_items. Defaults to 1, no batching.
+            batch_latency (float, optional): maximum seconds an item waits for its batch.
+                Defaults to 0.1.
+        """
         self._processors: List[Processor] = []
+        self._names: List[str] = []
+        self._stats: List[StageStats] = []
         self._logger = create_logger()
+        self._batch_size = batch_size
+        self._batch_latency = batch_latency
+        self._batcher = None
+        # batch the items forwarded by the asynchronous processors, per processor
+        self._forward_batchers: List[MicroBatcher] = []
+        if batch_size > 1:
+            self._batcher = MicroBatcher(self.update_items, batch_size, batch_latency)
 
-    def append_processor(self, processor: Processor) -> None:
+    def append_processor(self, processor: Processor, name: Optional[str] = None) -> None:
         """Add a processor to the list
 
         Args:
             processor (Processor): processor
+            name (str, optional): name of the processor in the stats.
+                Defaults to the class name of the processor.
         """
-        self._processors.append(processor)
+        self._register(processor, name)
+        if self._batcher:
+            batcher = MicroBatcher(
+                functools.partial(self._update_items_from, len(self._processors)),
+                self._batch_size, self._batch_latency)
+            self._forward_batchers.append(batcher)
+            processor.set_forward(batcher.put)
+        else:
+            processor.set_forward(functools.partial(self._update_from, len(self._processors)))
 
     def update_item(self, item: MyCollectItem) -> Optional[MyCollectItem]:
         """Updates an item using the processors
@@ -41,14 +188,91 @@ class PipelineProcessor(Processor):
             item (MyCollectItem): MyCollectItem
 
         Returns:
-            MyCollectItem: The updated item
+            MyCollectItem: The updated item, None when the items are batched
         """
+        if self._batcher:
+            self._batcher.put(item)
+            return None
+        return self._update_from(0, item)
+
+    def update_items(self, items: List[MyCollectItem],  # pylint:disable=unused-argument
+                     on_error: ErrorCallback = None) -> List[MyCollectItem]:
+        """Updates a batch of items using the processors
+
+        Args:
+            items (List[MyCollectItem]): MyCollectItems
+            on_error (ErrorCallback, optional): unused, the errors are counted
+                in the stats of each processor
+
+        Returns:
+            List[MyCollectItem]: The updated items
+        """
+        return self._update_items_from(0, items)
+
+    def stats(self) -> Dict[str, dict]:
+        """Gets the counters and the latencies of each processor
+
+        Returns:
+            Dict[str, dict]: per processor name, items received, filtered items
+                (dropped or completed in the background), errors, latency percentiles
+                of the calls in milliseconds and the counters of the processor itself
+        """
+        stats = {}
+        for name, processor, processor_stats in zip(self._names, self._processors, self._stats):
+            stats[name] = processor_stats.snapshot()
+            own_stats = processor.stats()
+            if own_stats:
+                stats[name]["processor"] = own_stats
+        return stats
+
+    def close(self) -> None:
+        """Processes the batched items and closes the processors, in the pipeline order
+        """
+        if self._batcher:
+            self._batcher.close()
+        for index, processor in enumerate(self._processors):
+            processor.close()
+            if self._forward_batchers:
+                self._forward_batchers[index].close()
+
+    def _register(self, processor: Processor, name: Optional[str]) -> None:
+        name = name or get_object_fqdn(processor)
+        if name in self._names:
+            name += f"_{len(self._names)}"
+        self._processors.append(processor)
+        self._names.append(name)
+        self._stats.append(StageStats())
+
+    def _update_items_from(self, start: int, items: List[MyCollectItem]) -> List[MyCollectItem]:
+        new_items = items
+        for processor, stats in zip(self._processors[start:], self._stats[start:]):
+            failed: List[MyCollectItem] = []
+            begin = time.perf_counter()
+            try:
+                updated_items = processor.update_items(
+                    new_items, on_error=lambda item, _: failed.append(item))  # pylint:disable=cell-var-from-loop
+            except Exception as err:  # pylint:disable=broad-except
+                self._logger.exception(err)
+                stats.record(time.perf_counter() - begin, len(new_items), errors=len(new_items))
+                continue
+            stats.record(time.perf_counter() - begin, len(new_items),
+                         filtered=len(new_items) - len(updated_items), errors=len(failed))
+            new_items = updated_items
+            if not new_items:
+                break
+        return new_items
+
+    def _update_from(self, start: int, item: MyCollectItem) -> Optional[MyCollectItem]:
         new_item = item
-        for processor in self._processors:
+        for processor, stats in zip(self._processors[start:], self._stats[start:]):
+            begin = time.perf_counter()
             try:
                 new_item = processor.update_item(item) # type: ignore
-                if not new_item:
-                    break
             except Exception as err:  # pylint:disable=broad-except
                 self._logger.exception(err)
+                stats.record(time.perf_counter() - begin, errors=1)
+                continue
+            stats.record(time.perf_counter() - begin, filtered=0 if new_item else 1)
+            if not new_item:
+                break
         return new_item
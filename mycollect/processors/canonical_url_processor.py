@@ -0,0 +1,38 @@
+"""
+Processor that rewrites the url of the items to its canonical form
+"""
+from typing import Dict, List, Optional
+
+from mycollect.canonical import UrlCanonicalizer
+from mycollect.processors import Processor
+from mycollect.structures import MyCollectItem
+
+
+class CanonicalUrlProcessor(Processor):
+
+    """Removes the tracking parameters and the fragment of the url of the MyCollectItem,
+    the shared url is kept in extra origin_url
+    """
+
+    def __init__(self, strip_params: List[str] = None,
+                 domain_rules: Dict[str, List[str]] = None):
+        """CanonicalUrlProcessor ctor
+
+        Args:
+            strip_params (List[str], optional): patterns of the query parameters removed
+                from all the urls. Defaults to the common tracking parameters.
+            domain_rules (Dict[str, List[str]], optional): patterns of the query parameters
+                removed from the urls of a domain and its subdomains, "*" removes the whole query.
+        """
+        super().__init__()
+        self._canonicalizer = UrlCanonicalizer(strip_params, domain_rules)
+
+    def update_item(self, item: MyCollectItem) -> Optional[MyCollectItem]:
+        """
+            Updates the current MyCollectItem, return None to drop this item
+        """
+        canonical = self._canonicalizer.canonicalize(item.url)
+        if canonical != item.url:
+            item.extra.setdefault("origin_url", item.url)
+            item.url = canonical
+        return item
@@ -0,0 +1,222 @@
+"""
+Processor that detects the items already seen in a time window
+"""
+from collections import deque
+import hashlib
+import math
+import threading
+import time
+from typing import Deque, Optional
+
+from mycollect.canonical import UrlCanonicalizer
+from mycollect.logger import create_logger
+from mycollect.processors import Processor
+from mycollect.structures import MyCollectItem
+
+
+DEDUP_KEYS = ["url", "tweet"]
+DEDUP_ACTIONS = ["mark", "drop"]
+
+
+class BloomFilter():
+
+    """Set membership with a bounded size and a false positive rate
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """BloomFilter ctor
+
+        Args:
+            capacity (int): number of keys the filter is sized for
+            error_rate (float): false positive rate once the capacity is reached
+        """
+        self.capacity = capacity
+        self.count = 0
+        self._size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def add(self, key: str) -> None:
+        """Adds a key to the filter
+
+        Args:
+            key (str): key
+        """
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    @property
+    def size_bytes(self) -> int:
+        """Gets the memory used by the bits of the filter
+
+        Returns:
+            int: bytes
+        """
+        return len(self._bits)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for index in range(self._hashes):
+            yield (first + index * second) % self._size
+
+
+class RotatingBloomFilter():
+
+    """Bloom filters covering consecutive slices of a time window,
+    the oldest slice is dropped when a new one starts
+    """
+
+    def __init__(self, window: float, capacity: int, error_rate: float, slices: int = 4):
+        """RotatingBloomFilter ctor
+
+        Args:
+            window (float): seconds a key is remembered
+            capacity (int): keys added during a window, a slice receiving more
+                than its share is replaced early and the window gets shorter
+            error_rate (float): false positive rate of the whole window
+            slices (int, optional): filters covering the window. Defaults to 4.
+        """
+        self._slice_duration = window / slices
+        self._slice_capacity = max(1, math.ceil(capacity / slices))
+        # a lookup checks every filter, their false positives add up
+        self._error_rate = error_rate / slices
+        self._logger = create_logger()
+        self._filters: Deque[BloomFilter] = deque(maxlen=slices)
+        self._slice_starts: Deque[float] = deque(maxlen=slices)
+        self.rotations = 0
+        self.early_rotations = 0
+
+    def check_and_add(self, key: str, now: Optional[float] = None) -> bool:
+        """Adds a key, tells if it was already seen
+
+        Args:
+            key (str): key
+            now (float, optional): current time in seconds. Defaults to time.monotonic().
+
+        Returns:
+            bool: True if the key was probably added during the window
+        """
+        now = time.monotonic() if now is None else now
+        current = self._filters[-1] if self._filters else None
+        early = current is not None and current.count >= current.capacity \
+            and now - self._slice_starts[-1] < self._slice_duration
+        if current is None or early or now - self._slice_starts[-1] >= self._slice_duration:
+            # a full slice starts a new one early, to keep the false positive rate,
+            # the keys are then remembered for less than the window
+            current = BloomFilter(self._slice_capacity, self._error_rate)
+            self._filters.append(current)
+            self._slice_starts.append(now)
+            self.rotations += 1
+            if early:
+                self.early_rotations += 1
+                self._logger.warning("dedup capacity reached, window shortened",
+                                     capacity=self._slice_capacity * len(self._filters),
+                                     window_seconds=round(now - self._slice_starts[0]))
+        if any(key in bloom_filter for bloom_filter in self._filters):
+            return True
+        current.add(key)
+        return False
+
+    @property
+    def size_bytes(self) -> int:
+        """Gets the memory used by the filters
+
+        Returns:
+            int: bytes
+        """
+        return sum(bloom_filter.size_bytes for bloom_filter in self._filters)
+
+
+class DedupProcessor(Processor):
+
+    """Marks or drops the items already seen during a time window,
+    items are identified by their tweet or their canonical url and category
+    """
+
+    def __init__(self, key: str = "url", action: str = "mark",  # pylint:disable=too-many-arguments
+                 window: float = 3600, capacity: int = 100000, error_rate: float = 0.001,
+                 slices: int = 4, canonical: dict = None):
+        """DedupProcessor ctor
+
+        Args:
+            key (str, optional): url (canonical url and category) or tweet (id of the tweet,
+                of the original tweet for the retweets). Defaults to "url".
+            action (str, optional): mark the duplicates with extra duplicate, they still
+                go through the rest of the pipeline and are stored, or drop them, they are
+                then missing from the storages and from the counts of the aggregators.
+                Defaults to "mark".
+            window (float, optional): seconds an item is remembered. Defaults to 3600.
+            capacity (int, optional): items expected during a window,
+                the memory used grows with it. Above it the items are remembered
+                for less than the window, see early_rotations. Defaults to 100000.
+            error_rate (float, optional): probability that a new item is taken
+                for a duplicate. Defaults to 0.001.
+            slices (int, optional): filters covering the window, the oldest one is dropped
+                when a new one starts. Defaults to 4.
+            canonical (dict, optional): strip_params and domain_rules of the UrlCanonicalizer.
+        """
+        super().__init__()
+        if key not in DEDUP_KEYS:
+            raise ValueError(f"unknown dedup key {key}")
+        if action not in DEDUP_ACTIONS:
+            raise ValueError(f"unknown dedup action {action}")
+        self._key = key
+        self._action = action
+        self._canonicalizer = UrlCanonicalizer(**(canonical or {}))
+        self._filter = RotatingBloomFilter(window, capacity, error_rate, slices)
+        self._lock = threading.Lock()
+        self._counters = {"checked": 0, "duplicates": 0, "without_key": 0}
+
+    def update_item(self, item: MyCollectItem) -> Optional[MyCollectItem]:
+        """
+            Updates the current MyCollectItem, return None to drop this item
+        """
+        key = self._get_key(item)
+        with self._lock:
+            if key is None:
+                self._counters["without_key"] += 1
+                return item
+            self._counters["checked"] += 1
+            duplicate = self._filter.check_and_add(key)
+            if duplicate:
+                self._counters["duplicates"] += 1
+        if not duplicate:
+            return item
+        if self._action == "drop":
+            return None
+        item.extra["duplicate"] = True
+        return item
+
+    def stats(self) -> dict:
+        """Gets the counters of this processor
+
+        Returns:
+            dict: checked items, duplicates, items without key, rotations,
+                rotations caused by the capacity and bytes used by the filters
+        """
+        with self._lock:
+            return dict(self._counters, rotations=self._filter.rotations,
+                        early_rotations=self._filter.early_rotations,
+                        size_bytes=self._filter.size_bytes)
+
+    def _get_key(self, item: MyCollectItem) -> Optional[str]:
+        if self._key == "url":
+            url = self._canonicalizer.key(item.url)
+            return f"{item.category}\n{url}" if url else None
+        tweet = item.extra.get("tweet")
+        if not isinstance(tweet, dict):
+            return None
+        # streaming api tweets embed the retweeted tweet, api v2 tweets reference it
+        tweet = tweet.get("retweeted_status") or tweet.get("data") or tweet
+        tweet_id = tweet.get("id_str") or tweet.get("id")
+        for referenced in tweet.get("referenced_tweets") or []:
+            if referenced.get("type") == "retweeted":
+                tweet_id = referenced.get("id")
+        return str(tweet_id) if tweet_id else None
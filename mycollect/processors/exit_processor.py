@@ -1,27 +1,246 @@
 """Last processor
 """
 
-from typing import Optional, List
+from collections import deque
+import json
+import os
+import threading
+import time
+from typing import Deque, Dict, Optional, List
 
-from mycollect.processors import Processor
+from mycollect.logger import create_logger
+from mycollect.processors import ErrorCallback, Processor
+from mycollect.stats import StageStats
 from mycollect.storage import Storage
 from mycollect.structures import MyCollectItem
+from mycollect.utils import get_object_fqdn
+
+
+BACKPRESSURE_POLICIES = ["block", "drop_oldest", "spill"]
+
+
+class StorageWorker():  # pylint:disable=too-many-instance-attributes
+
+    """Writes the items into a storage from a dedicated thread,
+    the items are queued in a bounded queue
+    """
+
+    def __init__(self, storage: Storage, name: str,  # pylint:disable=too-many-arguments
+                 queue_size: int = 1000, backpressure: str = "block",
+                 spill_folder: Optional[str] = None, batch_size: int = 100,
+                 stats: Optional[StageStats] = None):
+        """StorageWorker ctor
+
+        Args:
+            storage (Storage): the storage
+            name (str): name of the worker, used for the spill file
+            queue_size (int, optional): maximum items in the queue. Defaults to 1000.
+            backpressure (str, optional): what happens when the queue is full:
+                block the caller, drop_oldest item of the queue,
+                or spill the item to a file replayed once the queue is empty.
+                Defaults to "block".
+            spill_folder (str, optional): folder of the spill files, required by spill.
+            batch_size (int, optional): maximum queued items written at once. Defaults to 100.
+            stats (StageStats, optional): records the writes into the storage.
+        """
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"unknown backpressure policy {backpressure}")
+        if backpressure == "spill" and not spill_folder:
+            raise ValueError("spill backpressure requires a spill_folder")
+        self._storage = storage
+        self._queue_size = queue_size
+        self._backpressure = backpressure
+        self._batch_size = batch_size
+        self._stats = stats or StageStats()
+        self._spill_path = None
+        if spill_folder:
+            os.makedirs(spill_folder, exist_ok=True)
+            self._spill_path = os.path.join(spill_folder, name + ".spill.jsonl")
+        self._logger = create_logger().bind(storage=name)
+        self._queue: Deque[MyCollectItem] = deque()
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._counters = {"dropped": 0, "spilled": 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, item: MyCollectItem) -> None:
+        """Queues an item, applying the backpressure policy if the queue is full
+
+        Args:
+            item (MyCollectItem): item to store
+        """
+        with self._condition:
+            while len(self._queue) >= self._queue_size and self._backpressure == "block":
+                self._condition.wait()
+            if len(self._queue) >= self._queue_size:
+                if self._backpressure == "drop_oldest":
+                    self._queue.popleft()
+                    self._counters["dropped"] += 1
+                else:
+                    self._spill(item)
+                    return
+            self._queue.append(item)
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """Gets the counters of the queue of this worker,
+        the writes are recorded in the StageStats
+
+        Returns:
+            dict: queue depth, dropped and spilled items
+        """
+        with self._condition:
+            return dict(self._counters, queue_depth=len(self._queue))
+
+    def close(self) -> None:
+        """Writes the queued and spilled items and stops the worker
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _spill(self, item: MyCollectItem):
+        with self._spill_lock:
+            with open(self._spill_path, 'a', encoding='utf-8') as spill_file:  # type: ignore
+                spill_file.write(json.dumps(item.to_dict()) + '\n')
+        self._counters["spilled"] += 1
+
+    def _replay_spill(self) -> bool:
+        if not self._spill_path or not os.path.exists(self._spill_path):
+            return False
+        replay_path = self._spill_path + ".replay"
+        with self._spill_lock:
+            os.replace(self._spill_path, replay_path)
+        with open(replay_path, encoding='utf-8') as replay_file:
+            batch = []
+            for line in replay_file:
+                batch.append(MyCollectItem.from_dict(json.loads(line)))
+                if len(batch) >= self._batch_size:
+                    self._store(batch)
+                    batch = []
+            if batch:
+                self._store(batch)
+        os.remove(replay_path)
+        return True
+
+    def _store(self, items: List[MyCollectItem]):
+        start = time.perf_counter()
+        try:
+            self._storage.store_items(items)
+        except Exception as err:  # pylint:disable=broad-except
+            self._logger.exception(err)
+            self._stats.record(time.perf_counter() - start, len(items), errors=len(items))
+            return
+        self._stats.record(time.perf_counter() - start, len(items))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    if self._spill_path and os.path.exists(self._spill_path):
+                        break
+                    self._condition.wait()
+                batch = [self._queue.popleft()
+                         for _ in range(min(self._batch_size, len(self._queue)))]
+                self._condition.notify_all()
+            if batch:
+                self._store(batch)
+            elif not self._replay_spill() and self._closed:
+                return
 
 
 class ExitProcessor(Processor):  # pylint:disable=R0903
     """Last processor that use storage to save the item
     """
 
-    def __init__(self, storages: List[Storage]):
+    def __init__(self, storages: List[Storage], concurrent: bool = False, **kwargs):
+        """ExitProcessor ctor
+
+        Args:
+            storages (List[Storage]): storages receiving the items
+            concurrent (bool, optional): each storage gets its own queue and worker thread,
+                a slow storage doesn't delay the others. Defaults to False.
+            kwargs: queue_size, backpressure, spill_folder and batch_size of the StorageWorker
+        """
         if not storages:
             raise ValueError("storages")
         if not isinstance(storages, list):
             storages = [storages]  # type:ignore
         self._storages: List[Storage] = storages
+        self._names: List[str] = []
+        self._stats: Dict[str, StageStats] = {}
+        for storage in storages:
+            name = get_object_fqdn(storage)
+            if name in self._stats:
+                name += f"_{len(self._stats)}"
+            self._names.append(name)
+            self._stats[name] = StageStats()
+        self._workers: Dict[str, StorageWorker] = {}
+        if concurrent:
+            for name, storage in zip(self._names, storages):
+                self._workers[name] = StorageWorker(storage, name, stats=self._stats[name],
+                                                    **kwargs)
 
     def update_item(self, item: MyCollectItem) -> Optional[MyCollectItem]: # type:ignore
         """
             Updates the current MyCollectItem, return None to drop this item
         """
+        if self._workers:
+            for worker in self._workers.values():
+                worker.put(item)
+            return
+        for name, storage in zip(self._names, self._storages):
+            start = time.perf_counter()
+            try:
+                storage.store_item(item)
+            except Exception:
+                self._stats[name].record(time.perf_counter() - start, errors=1)
+                raise
+            self._stats[name].record(time.perf_counter() - start)
+
+    def update_items(self, items: List[MyCollectItem],  # pylint:disable=unused-argument
+                     on_error: ErrorCallback = None) -> List[MyCollectItem]:
+        """
+            Stores a batch of items, the storages write them at once,
+            a failed write raises for the whole batch
+        """
+        if self._workers:
+            for item in items:
+                for worker in self._workers.values():
+                    worker.put(item)
+            return []
+        for name, storage in zip(self._names, self._storages):
+            start = time.perf_counter()
+            try:
+                storage.store_items(items)
+            except Exception:
+                self._stats[name].record(time.perf_counter() - start, len(items),
+                                         errors=len(items))
+                raise
+            self._stats[name].record(time.perf_counter() - start, len(items))
+        return []
+
+    def stats(self) -> Dict[str, dict]:
+        """Gets the counters and the write latencies of each storage
+
+        Returns:
+            Dict[str, dict]: per storage, items given to the storage, written items,
+                errors and latency percentiles of the writes, the queue depth,
+                dropped and spilled items of the storage worker when concurrent
+        """
+        stats = {}
+        for name, storage_stats in self._stats.items():
+            stats[name] = storage_stats.snapshot()
+            stats[name]["written"] = stats[name]["items"] - stats[name]["errors"]
+            if name in self._workers:
+                stats[name].update(self._workers[name].stats())
+        return stats
+
+    def close(self) -> None:
+        for worker in self._workers.values():
+            worker.close()
         for storage in self._storages:
-            storage.store_item(item)
+            storage.close()
@@ -0,0 +1,219 @@
+"""
+    Pipeline running each processor in its own stage,
+    stages are connected by bounded queues
+"""
+from collections import deque
+import functools
+import threading
+import time
+from typing import Callable, Deque, Dict, List, Optional
+
+from mycollect.logger import create_logger
+from mycollect.processors import ErrorCallback, PipelineProcessor, Processor
+from mycollect.stats import StageStats
+from mycollect.structures import MyCollectItem
+
+
+STAGE_POLICIES = ["block", "drop", "shed"]
+
+
+class Stage():  # pylint:disable=too-many-instance-attributes
+
+    """Runs a processor on worker threads, fed by a bounded queue
+    """
+
+    def __init__(self, processor: Processor,  # pylint:disable=too-many-arguments
+                 forward: Callable[[MyCollectItem], None], name: str, stats: StageStats,
+                 workers: int = 1, queue_size: int = 1000, backpressure: str = "block",
+                 batch_size: int = 1):
+        """Stage ctor
+
+        Args:
+            processor (Processor): processor updating the items,
+                it must be thread safe with more than one worker
+            forward (Callable[[MyCollectItem], None]): receives the updated items
+            name (str): name of the stage
+            stats (StageStats): records the calls to the processor
+            workers (int, optional): threads running the processor. Defaults to 1.
+            queue_size (int, optional): maximum items waiting for a worker. Defaults to 1000.
+            backpressure (str, optional): what happens when the queue is full:
+                block the caller, drop the item, or shed the items flagged
+                low_priority and block for the others. Defaults to "block".
+            batch_size (int, optional): maximum items given at once to update_items
+                of the processor. Defaults to 1.
+        """
+        if backpressure not in STAGE_POLICIES:
+            raise ValueError(f"unknown backpressure policy {backpressure}")
+        self._processor = processor
+        self._forward = forward
+        self._queue_size = queue_size
+        self._backpressure = backpressure
+        self._batch_size = batch_size
+        self._logger = create_logger().bind(stage=name)
+        self._queue: Deque[MyCollectItem] = deque()
+        self._condition = threading.Condition()
+        self._stats = stats
+        self._counters = {"dropped": 0, "shed": 0}
+        self._closed = False
+        self._workers = [threading.Thread(target=self._run, daemon=True)
+                         for _ in range(max(workers, 1))]
+        for worker in self._workers:
+            worker.start()
+
+    def put(self, item: MyCollectItem) -> None:
+        """Queues an item, applying the backpressure policy if the queue is full
+
+        Args:
+            item (MyCollectItem): item to process
+        """
+        with self._condition:
+            if len(self._queue) >= self._queue_size:
+                if self._backpressure == "drop":
+                    self._counters["dropped"] += 1
+                    return
+                if self._backpressure == "shed" and item.low_priority:
+                    self._counters["shed"] += 1
+                    return
+            while len(self._queue) >= self._queue_size:
+                self._condition.wait()
+            self._queue.append(item)
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """Gets the counters of this stage
+
+        Returns:
+            dict: queue depth, items dropped and shed by the backpressure,
+                the counters and latencies of the processor
+        """
+        with self._condition:
+            return dict(self._stats.snapshot(), queue_depth=len(self._queue), **self._counters)
+
+    def close(self) -> None:
+        """Processes the queued items and stops the workers
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft()
+                         for _ in range(min(self._batch_size, len(self._queue)))]
+                self._condition.notify_all()
+            failed: List[MyCollectItem] = []
+            start = time.perf_counter()
+            try:
+                new_items = self._processor.update_items(
+                    batch, on_error=lambda item, _: failed.append(item))  # pylint:disable=cell-var-from-loop
+            except Exception as err:  # pylint:disable=broad-except
+                self._logger.exception(err)
+                self._stats.record(time.perf_counter() - start, len(batch), errors=len(batch))
+                continue
+            self._stats.record(time.perf_counter() - start, len(batch),
+                               filtered=len(batch) - len(new_items), errors=len(failed))
+            for new_item in new_items:
+                self._forward(new_item)
+
+
+class StagedPipelineProcessor(PipelineProcessor):
+
+    """Pipeline where each processor runs in a stage with its own queue and workers,
+    the caller only queues the items in the first stage
+    """
+
+    def __init__(self, workers: int = 1, queue_size: int = 1000,  # pylint:disable=too-many-arguments
+                 backpressure: str = "block", batch_size: int = 1,
+                 stages: Dict[str, dict] = None):
+        """StagedPipelineProcessor ctor
+
+        Args:
+            workers (int, optional): default workers of the stages. Defaults to 1.
+            queue_size (int, optional): default queue size of the stages. Defaults to 1000.
+            backpressure (str, optional): default backpressure policy of the stages.
+                Defaults to "block".
+            batch_size (int, optional): default maximum items processed at once by a stage.
+                Defaults to 1.
+            stages (Dict[str, dict], optional): workers, queue_size, backpressure
+                and batch_size per stage name.
+        """
+        super().__init__()
+        self._defaults = {"workers": workers, "queue_size": queue_size,
+                          "backpressure": backpressure, "batch_size": batch_size}
+        self._stage_configurations = stages or {}
+        self._stages: List[Stage] = []
+
+    def append_processor(self, processor: Processor, name: Optional[str] = None) -> None:
+        """Add a processor in a new stage
+
+        Args:
+            processor (Processor): processor
+            name (str, optional): name of the stage. Defaults to the class name of the processor.
+        """
+        self._register(processor, name)
+        name = self._names[-1]
+        forward = functools.partial(self._put_from, len(self._processors))
+        processor.set_forward(forward)
+        configuration = dict(self._defaults, **self._stage_configurations.get(name, {}))
+        self._stages.append(Stage(processor, forward, name, self._stats[-1], **configuration))
+
+    def update_item(self, item: MyCollectItem) -> Optional[MyCollectItem]:
+        """Queues an item in the first stage
+
+        Args:
+            item (MyCollectItem): MyCollectItem
+
+        Returns:
+            MyCollectItem: None, the item is processed by the stages
+        """
+        self._put_from(0, item)
+        return None
+
+    def update_items(self, items: List[MyCollectItem],  # pylint:disable=unused-argument
+                     on_error: ErrorCallback = None) -> List[MyCollectItem]:
+        """Queues a batch of items in the first stage
+
+        Args:
+            items (List[MyCollectItem]): MyCollectItems
+            on_error (ErrorCallback, optional): unused, the errors are counted
+                in the stats of each stage
+
+        Returns:
+            List[MyCollectItem]: empty, the items are processed by the stages
+        """
+        for item in items:
+            self._put_from(0, item)
+        return []
+
+    def stats(self) -> Dict[str, dict]:
+        """Gets the counters of each stage
+
+        Returns:
+            Dict[str, dict]: counters and latencies per stage name,
+                with the counters of the processor itself
+        """
+        stats = {}
+        for name, stage, processor in zip(self._names, self._stages, self._processors):
+            stats[name] = stage.stats()
+            own_stats = processor.stats()
+            if own_stats:
+                stats[name]["processor"] = own_stats
+        return stats
+
+    def close(self) -> None:
+        """Drains the stages and closes their processor, in the pipeline order
+        """
+        for stage, processor in zip(self._stages, self._processors):
+            stage.close()
+            processor.close()
+
+    def _put_from(self, index: int, item: MyCollectItem) -> None:
+        if index < len(self._stages):
+            self._stages[index].put(item)
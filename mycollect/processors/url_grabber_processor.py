@@ -1,15 +1,24 @@
 """
 Processor that will get the content of a webpage
 """
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 import json
-from typing import Optional
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import cloudscraper #type: ignore
-from newspaper.article import (Article, ArticleDownloadState,  # type: ignore
-                               Configuration)
+from newspaper.article import Article, Configuration  # type: ignore
+import requests
+from requests.adapters import HTTPAdapter
 
-from mycollect.cache import DbmCache
+from mycollect.canonical import UrlCanonicalizer
+from mycollect.cache import ContentAddressedCache, FailureCache, LruCache, create_cache
 from mycollect.logger import create_logger
 from mycollect.processors import Processor
 from mycollect.structures import MyCollectItem
@@ -20,78 +29,513 @@ INVALID_URL_NEWS = [
     "https://youtu.be"
 ]
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:85.0) Gecko/20100101 Firefox/85.0'
 
-class UrlGrabberProcessor(Processor):  # pylint:disable=too-few-public-methods
+HTML_CONTENT_TYPES = ["text/html", "application/xhtml+xml"]
+
+
+class DownloadAborted(Exception):
+
+    """The download stopped before the end of the response
+    """
+
+    def __init__(self, reason: str, message: str):
+        """DownloadAborted ctor
+
+        Args:
+            reason (str): content_type or size
+            message (str): description of the response
+        """
+        super().__init__(message)
+        self.reason = reason
+
+
+@dataclass
+class InflightGrab():
+
+    """Download shared by the items of the same url
+    """
+
+    done: threading.Event = field(default_factory=threading.Event)
+    article: Optional[dict] = None
+    canonical_link: Optional[str] = None
+    followers: List[MyCollectItem] = field(default_factory=list)
+
+
+def parse_article(url: str, html: Union[str, bytes]) -> dict:
+    """Extracts the article of a web page, runs in the parsing processes
+
+    Args:
+        url (str): url of the page
+        html (Union[str, bytes]): content of the page, utf-8 encoded when sent to a process
+
+    Returns:
+        dict: text, title, keywords and canonical_link of the article, seconds spent
+            decoding the page and parsing, wall clock times of the start and the end
+    """
+    started_at = time.time()
+    start = time.perf_counter()
+    if isinstance(html, bytes):
+        html = html.decode()
+    decode_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    config = Configuration()
+    config.browser_user_agent = USER_AGENT
+    article = Article(url, config=config)
+    article.set_html(html)
+    article.parse()
+    return {
+        "text": article.text,
+        "title": article.title,
+        "keywords": article.keywords,
+        "canonical_link": article.canonical_link,
+        "seconds": time.perf_counter() - start,
+        "decode_seconds": decode_seconds,
+        "started_at": started_at,
+        "finished_at": time.time()
+    }
+
+
+class HostQueue():
+
+    """Bounded queue of items to download, handing out the items of the hosts
+    below their concurrency and rate limits, hosts are served in turn
+    """
+
+    def __init__(self, max_items: int = 1000, host_concurrency: int = 2,
+                 host_rate: float = 1.0):
+        """HostQueue ctor
+
+        Args:
+            max_items (int, optional): maximum queued items, put blocks above. Defaults to 1000.
+            host_concurrency (int, optional): maximum items of a host handed out at the same time.
+                Defaults to 2.
+            host_rate (float, optional): maximum items of a host handed out per second.
+                Defaults to 1.0.
+        """
+        self._max_items = max_items
+        self._host_concurrency = host_concurrency
+        self._interval = 1.0 / host_rate if host_rate else 0.0
+        self._pending: "OrderedDict[str, Deque[MyCollectItem]]" = OrderedDict()
+        self._active: Dict[str, int] = {}
+        self._next_start: Dict[str, float] = {}
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def put(self, host: str, item: MyCollectItem) -> None:
+        """Queues an item, blocks while the queue is full
+
+        Args:
+            host (str): host of the item url
+            item (MyCollectItem): item
+        """
+        with self._condition:
+            while self._size >= self._max_items:
+                self._condition.wait()
+            self._pending.setdefault(host, deque()).append(item)
+            self._size += 1
+            self._condition.notify_all()
+
+    def get(self) -> Optional[Tuple[str, MyCollectItem]]:
+        """Waits for an item whose host is below its limits,
+        done must be called once the item is processed
+
+        Returns:
+            Optional[Tuple[str, MyCollectItem]]: host and item, None once closed and empty
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wake_at = None
+                for host, items in self._pending.items():
+                    if self._active.get(host, 0) >= self._host_concurrency:
+                        continue
+                    start = self._next_start.get(host, 0.0)
+                    if start > now:
+                        wake_at = start if wake_at is None else min(wake_at, start)
+                        continue
+                    item = items.popleft()
+                    if items:
+                        self._pending.move_to_end(host)
+                    else:
+                        del self._pending[host]
+                    self._size -= 1
+                    self._active[host] = self._active.get(host, 0) + 1
+                    self._next_start[host] = now + self._interval
+                    self._condition.notify_all()
+                    return host, item
+                if self._closed and not self._size:
+                    return None
+                self._condition.wait(None if wake_at is None else wake_at - now)
+
+    def done(self, host: str) -> None:
+        """Releases the slot of the host taken by get
+
+        Args:
+            host (str): host of the processed item
+        """
+        with self._condition:
+            self._active[host] -= 1
+            if not self._active[host]:
+                del self._active[host]
+            if len(self._next_start) > self._max_items:
+                # forget the idle hosts whose rate limit is over
+                now = time.monotonic()
+                for idle_host in [idle_host for idle_host, start in self._next_start.items()
+                                  if start <= now and idle_host not in self._active
+                                  and idle_host not in self._pending]:
+                    del self._next_start[idle_host]
+            self._condition.notify_all()
+
+    def qsize(self) -> int:
+        """Number of queued items
+
+        Returns:
+            int: queued items
+        """
+        with self._condition:
+            return self._size
+
+    def close(self) -> None:
+        """Wakes up the consumers, get returns None once the queue is empty
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class UrlGrabberProcessor(Processor):  # pylint:disable=too-many-instance-attributes
 
     """Grab the content defined in the url of the MyCollectItem
     """
 
-    def __init__(self):
+    def __init__(self, cache: dict = None, working_folder: str = None,  # pylint:disable=too-many-arguments
+                 failure_delay: float = 600, failure_max_delay: float = 7 * 24 * 3600,
+                 host_failures: int = 5, workers: int = 0, queue_size: int = 1000,
+                 host_concurrency: int = 2, host_rate: float = 1.0, timeout: float = 10,
+                 canonical: dict = None, parse_workers: int = 0, connect_timeout: float = 5,
+                 max_bytes: int = 5 * 1024 * 1024, content_types: List[str] = None):
+        """UrlGrabberProcessor ctor
+
+        Args:
+            cache (dict, optional): type and args of the article cache. Defaults to a DbmCache.
+            working_folder (str, optional): folder of the default DbmCache,
+                a temporary folder if not set.
+            failure_delay (float, optional): seconds an url is skipped after a failed download,
+                doubled after each consecutive failure. Defaults to 600.
+            failure_max_delay (float, optional): maximum seconds an url or a host is skipped.
+                Defaults to 7 days.
+            host_failures (int, optional): consecutive failures of a host
+                before all its urls are skipped. Defaults to 5.
+            workers (int, optional): concurrent downloads, the items are forwarded
+                to the rest of the pipeline from a dedicated thread.
+                Defaults to 0, the articles are downloaded by the caller.
+            queue_size (int, optional): maximum items waiting for a worker, and maximum
+                completed items waiting to be forwarded, update_item blocks above.
+                Defaults to 1000.
+            host_concurrency (int, optional): maximum concurrent downloads per host. Defaults to 2.
+            host_rate (float, optional): maximum downloads per second per host. Defaults to 1.0.
+            timeout (float, optional): seconds waiting for the server between two reads
+                of the response. Defaults to 10.
+            canonical (dict, optional): strip_params and domain_rules of the UrlCanonicalizer
+                computing the cache keys.
+            parse_workers (int, optional): processes parsing the downloaded pages.
+                Defaults to 0, the pages are parsed by the downloading thread.
+            connect_timeout (float, optional): seconds to connect to the server. Defaults to 5.
+            max_bytes (int, optional): downloads are aborted above this size. Defaults to 5MiB.
+            content_types (List[str], optional): content types downloaded,
+                the other responses are aborted. Defaults to HTML_CONTENT_TYPES.
+        """
         super().__init__()
         self._logger = create_logger()
-        self._cache = DbmCache("url_grab")
+        self._cache = create_cache("url_grab", cache, working_folder)
+        self._articles = ContentAddressedCache("url_grab_articles", self._cache)
+        self._url_failures = FailureCache(self._cache, failure_delay, failure_max_delay)
+        self._host_failures = FailureCache(
+            LruCache("url_grab_hosts", ttl=failure_max_delay),
+            failure_delay, failure_max_delay, min_failures=host_failures)
+        self._canonicalizer = UrlCanonicalizer(**(canonical or {}))
+        self._cache_lock = threading.Lock()
+        self._counters = {"downloads": 0, "coalesced": 0, "failures": 0,
+                          "skipped_urls": 0, "skipped_hosts": 0, "aborted_content_type": 0,
+                          "aborted_size": 0, "parsed": 0,
+                          "parse_bytes": 0, "parse_seconds": 0.0, "queue_seconds": 0.0,
+                          "transfer_seconds": 0.0}
+        self._parser = None
+        if parse_workers:
+            # spawn, the forked children would inherit the locks held by the threads
+            self._parser = ProcessPoolExecutor(parse_workers,
+                                               mp_context=multiprocessing.get_context("spawn"))
+        self._inflight: Dict[str, InflightGrab] = {}
+        self._timeout = (connect_timeout, timeout)
+        self._max_bytes = max_bytes
+        self._content_types = content_types if content_types is not None else HTML_CONTENT_TYPES
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(workers, 10), pool_maxsize=max(workers, 10))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers["User-Agent"] = USER_AGENT
         self._cloudscrapper = cloudscraper.create_scraper()
+        self._forward: Callable[[MyCollectItem], Optional[MyCollectItem]] = lambda item: item
+        self._hosts = HostQueue(queue_size, host_concurrency, host_rate)
+        # bounded, a slow rest of the pipeline blocks the workers and update_item
+        self._completed: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._workers = [threading.Thread(target=self._work, daemon=True)
+                         for _ in range(workers)]
+        self._emitter = threading.Thread(target=self._emit, daemon=True)
+        if self._workers:
+            self._emitter.start()
+        for worker in self._workers:
+            worker.start()
 
     def update_item(self, item: MyCollectItem) -> Optional[MyCollectItem]:
         """
             Updates the current MyCollectItem, return None to drop this item
         """
-        if self._is_valid(item.url):
-            cache_article = self._cache.get_item(item.url)
-            if not cache_article:
-                user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:85.0)' \
-                    ' Gecko/20100101 Firefox/85.0'
-                config = Configuration()
-                config.browser_user_agent = user_agent
-                article = Article(item.url, config=config)
-                try:
-                    article.download(recursion_counter=2)
-                    if article.download_state == 1 and '403' in article.download_exception_msg:
-                        article = self._cloudscrap(article)
-                    if article.download_state == ArticleDownloadState.SUCCESS:
-                        article.parse()
-                except Exception as err:  # pylint:disable=broad-except
-                    self._logger.error(
-                        "Unable to download article", error=str(err))
-                    self._logger.debug(err)
-                else:
-                    if article.download_state == ArticleDownloadState.SUCCESS:
-                        cache_article = {
-                            "text": article.text,
-                            "title": article.title,
-                            "keywords": article.keywords
-                        }
-
-                        links = [item.url]
-                        if article.canonical_link:
-                            links.append(article.canonical_link)
-                            item.extra["origin_url"] = item.url
-                            item.url = article.canonical_link
-                        self._add_to_cache(cache_article, links)
-                    else:
-                        self._logger.warning("download state",
-                                             state=article.download_state,
-                                             url=item.url,
-                                             error_message=article.download_exception_msg)
-            else:
-                cache_article = json.loads(cache_article)
-            if cache_article:
-                item.extra["article"] = cache_article
+        if not self._workers:
+            return self._grab(item)
+        if not self._is_valid(item.url):
+            self._completed.put(item)
+            return None
+        key = self._canonicalizer.key(item.url)
+        host = urlparse(item.url).netloc
+        with self._cache_lock:
+            grab, leading = self._start_grab(item, key, host)
+            if grab and not leading:
+                # completed by the worker downloading the url, without waiting for a host slot
+                grab.followers.append(item)
+                return None
+        if grab:
+            self._hosts.put(host, item)
+        else:
+            self._completed.put(item)
+        return None
+
+    def set_forward(self, forward: Callable[[MyCollectItem], Optional[MyCollectItem]]) -> None:
+        self._forward = forward
+
+    def stats(self) -> dict:
+        """Gets the counters of this processor
+
+        Returns:
+            dict: downloads, items sharing the download of a previous item,
+                failed downloads, urls skipped because of their own or their host
+                previous failures, downloads aborted because of their content type
+                or their size, items waiting for a worker, parsed pages,
+                bytes of html sent to the parsers, seconds spent parsing,
+                seconds between the submission of the pages and the start of their parsing
+                (waiting for a free process and sending the page), and seconds spent
+                encoding and decoding the pages and returning the articles
+        """
+        with self._cache_lock:
+            return dict(self._counters, queued=self._hosts.qsize())
+
+    def close(self) -> None:
+        self._hosts.close()
+        for worker in self._workers:
+            worker.join()
+        if self._workers:
+            self._completed.put(None)
+            self._emitter.join()
+        if self._parser:
+            self._parser.shutdown()
+        self._cache.close()
+
+    def _work(self):
+        while True:
+            entry = self._hosts.get()
+            if entry is None:
+                return
+            host, item = entry
+            key = self._canonicalizer.key(item.url)
+            with self._cache_lock:
+                grab = self._inflight[key]
+            try:
+                self._fetch(item.url, key, host, grab)
+            except Exception as err:  # pylint:disable=broad-except
+                self._logger.exception(err)
+            finally:
+                self._hosts.done(host)
+                with self._cache_lock:
+                    del self._inflight[key]
+                grab.done.set()
+            for completed in [item] + grab.followers:
+                self._completed.put(self._apply_grab(completed, grab))
+
+    def _emit(self):
+        while True:
+            item = self._completed.get()
+            if item is None:
+                return
+            try:
+                self._forward(item)
+            except Exception as err:  # pylint:disable=broad-except
+                self._logger.exception(err)
+
+    def _grab(self, item: MyCollectItem) -> MyCollectItem:
+        if not self._is_valid(item.url):
+            return item
+        url = item.url
+        key = self._canonicalizer.key(url)
+        host = urlparse(url).netloc
+        with self._cache_lock:
+            grab, leading = self._start_grab(item, key, host)
+        if not grab:
+            return item
+        if not leading:
+            grab.done.wait()
+        else:
+            try:
+                self._fetch(url, key, host, grab)
+            finally:
+                with self._cache_lock:
+                    del self._inflight[key]
+                grab.done.set()
+        return self._apply_grab(item, grab)
+
+    def _start_grab(self, item: MyCollectItem, key: str,
+                    host: str) -> Tuple[Optional["InflightGrab"], bool]:
+        """Looks for the article in the caches, called with the cache lock
+
+        Returns:
+            Tuple[Optional[InflightGrab], bool]: the download of the url, None when the item
+                is completed from the cache or skipped, and True if the caller downloads it
+        """
+        cache_article = self._articles.get_item(key)
+        if cache_article:
+            item.extra["article"] = json.loads(cache_article)
+            return None, False
+        grab = self._inflight.get(key)
+        if grab:
+            self._counters["coalesced"] += 1
+            return grab, False
+        if self._is_skipped(key, host):
+            return None, False
+        self._counters["downloads"] += 1
+        grab = self._inflight[key] = InflightGrab()
+        return grab, True
+
+    @staticmethod
+    def _apply_grab(item: MyCollectItem, grab: "InflightGrab") -> MyCollectItem:
+        if grab.article is not None:
+            if grab.canonical_link:
+                item.extra.setdefault("origin_url", item.url)
+                item.url = grab.canonical_link
+            item.extra["article"] = grab.article
         return item
 
-    def _cloudscrap(self, article: Article) -> Article:
-        article_response = self._cloudscrapper.get(article.url)
-        if article_response.status_code == 200:
-            article.set_html(article_response.text)
+    def _fetch(self, url: str, key: str, host: str, grab: "InflightGrab"):
+        try:
+            html = self._download(url)
+            parsed = self._parse(url, html)
+        except DownloadAborted as err:
+            self._logger.info("download aborted", reason=err.reason, error=str(err), url=url)
+            with self._cache_lock:
+                self._counters["aborted_" + err.reason] += 1
+                self._url_failures.record_failure(key, str(err))
+            return
+        except Exception as err:  # pylint:disable=broad-except
+            self._logger.error(
+                "Unable to download article", error=str(err), url=url)
+            self._logger.debug(err)
+            with self._cache_lock:
+                self._record_failure(key, host, str(err))
+            return
+        grab.article = {
+            "text": parsed["text"],
+            "title": parsed["title"],
+            "keywords": parsed["keywords"]
+        }
+        links = [key]
+        if parsed["canonical_link"]:
+            links.append(self._canonicalizer.key(parsed["canonical_link"]))
+            grab.canonical_link = parsed["canonical_link"]
+        with self._cache_lock:
+            self._host_failures.record_success(host)
+            self._add_to_cache(grab.article, links)
+
+    def _parse(self, url: str, html: str) -> dict:
+        if not self._parser:
+            parsed = parse_article(url, html)
+            wait, transfer, size = 0.0, 0.0, 0
+        else:
+            start = time.perf_counter()
+            data = html.encode()
+            encode_seconds = time.perf_counter() - start
+            # wall clock, comparable between the processes
+            submitted_at = time.time()
+            parsed = self._parser.submit(parse_article, url, data).result()
+            received_at = time.time()
+            wait = max(0.0, parsed["started_at"] - submitted_at)
+            transfer = encode_seconds + parsed["decode_seconds"] \
+                + max(0.0, received_at - parsed["finished_at"])
+            size = len(data)
+        with self._cache_lock:
+            self._counters["parsed"] += 1
+            self._counters["parse_bytes"] += size
+            self._counters["parse_seconds"] += parsed["seconds"]
+            self._counters["queue_seconds"] += wait
+            self._counters["transfer_seconds"] += transfer
+        return parsed
+
+    def _download(self, url: str) -> str:
+        response = self._session.get(url, timeout=self._timeout, stream=True)
+        if response.status_code == 403:
+            response.close()
+            response = self._cloudscrapper.get(url, timeout=self._timeout, stream=True)
+        with response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").lower()
+            if content_type and not any(allowed in content_type
+                                        for allowed in self._content_types):
+                raise DownloadAborted("content_type", f"content type {content_type}")
+            length = response.headers.get("Content-Length", "")
+            if length.isdigit() and int(length) > self._max_bytes:
+                raise DownloadAborted("size", f"content length {length}")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > self._max_bytes:
+                    raise DownloadAborted("size", f"more than {self._max_bytes} bytes")
+                chunks.append(chunk)
+        content = b"".join(chunks)
+        encoding = response.encoding
+        if encoding in (None, "ISO-8859-1"):
+            # default of requests for text without charset, the page may declare its own
+            encodings = requests.utils.get_encodings_from_content(
+                content[:4096].decode("ascii", errors="ignore"))
+            if encodings:
+                encoding = encodings[0]
+        try:
+            return content.decode(encoding or "utf-8", errors="replace")
+        except LookupError:
+            return content.decode("utf-8", errors="replace")
+
+    def _is_skipped(self, url: str, host: str) -> bool:
+        failure = self._url_failures.get_failure(url)
+        if failure:
+            self._counters["skipped_urls"] += 1
         else:
-            article.download_state = article_response.status_code
-            article.download_exception_msg = article_response.reason
-        return article
+            failure = self._host_failures.get_failure(host)
+            if failure:
+                self._counters["skipped_hosts"] += 1
+        if failure:
+            self._logger.debug("download skipped", url=url, reason=failure["reason"],
+                               failures=failure["failures"], retry_at=failure["retry_at"])
+            return True
+        return False
+
+    def _record_failure(self, url: str, host: str, reason: str):
+        self._counters["failures"] += 1
+        self._url_failures.record_failure(url, reason)
+        self._host_failures.record_failure(host, reason)
 
     def _add_to_cache(self, item: dict, links: list):
         json_data = json.dumps(item)
         for link in links:
-            self._cache.set_item(link, json_data)
+            self._articles.set_item(link, json_data)
 
     @staticmethod
     def _is_valid(url):
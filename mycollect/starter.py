@@ -8,6 +8,8 @@ from typing import List, Dict, Any, Optional
 
 from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore
 from apscheduler.triggers.cron import CronTrigger  # type: ignore
+from apscheduler.triggers.interval import IntervalTrigger  # type: ignore
+import structlog  # type: ignore
 import yaml
 
 from mycollect.aggregators import Aggregator
@@ -16,6 +18,7 @@ from mycollect.logger import configure_logger, create_logger
 from mycollect.outputs import Output
 from mycollect.processors import PipelineProcessor, Processor
 from mycollect.processors.exit_processor import ExitProcessor
+from mycollect.processors.staged_pipeline_processor import StagedPipelineProcessor
 from mycollect.storage import Storage
 from mycollect.utils import get_class, get_object_fqdn
 
@@ -74,13 +77,24 @@ def run_aggregator(storage: Storage, aggregator: Aggregator, outputs: List[Outpu
     yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
     timestamp = round(yesterday.timestamp())
     local_logger.info("aggregator run started", from_timestamp=timestamp)
-    agg = aggregator.aggregates(storage.fetch_items(timestamp))
+    agg = aggregator.aggregates(storage.fetch_items(
+        timestamp, item_filter=aggregator.item_filter, fields=aggregator.fields))
     for output in outputs:
         output.render(agg, aggregator.notify)
     local_logger.info("aggregator run ended")
     log_next_runs()
 
 
+def log_pipeline_stats(pipeline: PipelineProcessor, logger: structlog.BoundLogger):
+    """Logs the counters and the latencies of the pipeline stages
+
+    Args:
+        pipeline (PipelineProcessor): the pipeline
+        logger (structlog.BoundLogger): logger receiving the stats
+    """
+    logger.info("pipeline stats", stages=pipeline.stats())
+
+
 def log_next_runs():
     """Logs the next jobs to run
     """
@@ -116,11 +130,21 @@ def main_loop(config, infinite=True):  # pylint:disable=too-many-locals
     aggregators: Dict[str, Aggregator] = load_types(configuration["aggregators"])
     outputs : Dict[str, Output] = load_types(configuration["outputs"])
 
-    pipeline = PipelineProcessor()
-    for item in processors.values():
-        pipeline.append_processor(item)
-    pipeline.append_processor(ExitProcessor(
-        [storages[s]["instance"] for s in storages])) #pylint:disable=consider-using-dict-items
+    exit_processor = ExitProcessor(
+        [storages[s]["instance"] for s in storages], #pylint:disable=consider-using-dict-items
+        **configuration.get("exit_processor", {}))
+    pipeline_configuration = dict(configuration.get("pipeline", {}))
+    stats_interval = pipeline_configuration.pop("stats_interval", 300)
+    if pipeline_configuration.pop("staged", False):
+        pipeline: PipelineProcessor = StagedPipelineProcessor(**pipeline_configuration)
+        for name, item in processors.items():
+            pipeline.append_processor(item, name)
+        pipeline.append_processor(exit_processor, "exit")
+    else:
+        pipeline = PipelineProcessor(**pipeline_configuration)
+        for name, item in processors.items():
+            pipeline.append_processor(item, name)
+        pipeline.append_processor(exit_processor, "exit")
 
     for key, collector in collectors.items():
         logger.info("starting collector", collector=key)
@@ -133,6 +157,10 @@ def main_loop(config, infinite=True):  # pylint:disable=too-many-locals
         trigger = CronTrigger.from_crontab(aggregator.schedule)
         SCHEDULER.add_job(run_aggregator, trigger, args=run_agg_args)
 
+    if stats_interval:
+        SCHEDULER.add_job(log_pipeline_stats, IntervalTrigger(seconds=stats_interval),
+                          args=[pipeline, logger], name="pipeline stats")
+
     SCHEDULER.start()
     log_next_runs()
     try:
@@ -145,6 +173,9 @@ def main_loop(config, infinite=True):  # pylint:disable=too-many-locals
             logger.info("stopping collector", collector=key)
             local_collector.stop()
         SCHEDULER.shutdown()
+        logger.info("closing pipeline")
+        pipeline.close()
+        log_pipeline_stats(pipeline, logger)
         logger.info("shutdown gracefully")
 
 
@@ -0,0 +1,110 @@
+"""Counters and latency histograms of the pipeline stages
+"""
+import bisect
+import math
+import threading
+from typing import List
+
+
+# logarithmic buckets from 10 microseconds to about 20 minutes
+BUCKET_GROWTH = 1.25
+BUCKET_BOUNDS: List[float] = [1e-5 * BUCKET_GROWTH ** index for index in range(84)]
+
+
+class LatencyHistogram():
+
+    """Histogram of latencies with logarithmic buckets,
+    percentiles are within 12% of the recorded values
+    """
+
+    def __init__(self):
+        """LatencyHistogram ctor
+        """
+        self._counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self._total = 0
+        self._max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Adds a latency to the histogram
+
+        Args:
+            seconds (float): latency
+        """
+        self._counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self._total += 1
+        if seconds > self._max:
+            self._max = seconds
+
+    def percentile(self, percent: float) -> float:
+        """Gets an estimation of a percentile
+
+        Args:
+            percent (float): percentile, between 0 and 100
+
+        Returns:
+            float: middle of the bucket holding the percentile, 0 without latency
+        """
+        if not self._total:
+            return 0.0
+        rank = max(1, round(self._total * percent / 100))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                if index == 0:
+                    return min(BUCKET_BOUNDS[0], self._max)
+                if index == len(BUCKET_BOUNDS):
+                    return self._max
+                # geometric middle of the bucket
+                return min(math.sqrt(BUCKET_BOUNDS[index - 1] * BUCKET_BOUNDS[index]), self._max)
+        return self._max
+
+    @property
+    def max(self) -> float:
+        """Gets the highest recorded latency
+
+        Returns:
+            float: seconds
+        """
+        return self._max
+
+
+class StageStats():
+
+    """Thread safe counters and latency histogram of a processor or a storage
+    """
+
+    def __init__(self):
+        """StageStats ctor
+        """
+        self._lock = threading.Lock()
+        self._histogram = LatencyHistogram()
+        self._counters = {"items": 0, "filtered": 0, "errors": 0}
+
+    def record(self, seconds: float, items: int = 1, filtered: int = 0, errors: int = 0) -> None:
+        """Records a call to the stage
+
+        Args:
+            seconds (float): latency of the call
+            items (int, optional): items given to the stage. Defaults to 1.
+            filtered (int, optional): items not returned by the stage. Defaults to 0.
+            errors (int, optional): items that raised an error. Defaults to 0.
+        """
+        with self._lock:
+            self._histogram.record(seconds)
+            self._counters["items"] += items
+            self._counters["filtered"] += filtered
+            self._counters["errors"] += errors
+
+    def snapshot(self) -> dict:
+        """Gets the counters and the latency percentiles
+
+        Returns:
+            dict: items, filtered, errors, p50, p95, p99 and max latencies in milliseconds
+        """
+        with self._lock:
+            return dict(self._counters,
+                        p50_ms=round(self._histogram.percentile(50) * 1000, 3),
+                        p95_ms=round(self._histogram.percentile(95) * 1000, 3),
+                        p99_ms=round(self._histogram.percentile(99) * 1000, 3),
+                        max_ms=round(self._histogram.max * 1000, 3))
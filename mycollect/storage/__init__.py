@@ -2,11 +2,77 @@
     Base for data managers
 """
 import abc
-from typing import Any, Iterable
+from dataclasses import dataclass, field
+import json
+from typing import Any, Iterable, List, Optional
 
 from mycollect.structures import MyCollectItem
 
 
+@dataclass
+class ItemFilter():
+
+    """Predicates pushed down to the storages when fetching items
+    """
+
+    categories: Optional[List[str]] = None
+    providers: Optional[List[str]] = None
+    has_article: bool = False
+    _needles: List[bytes] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._needles = [b'"category": ' + json.dumps(category).encode()
+                         for category in self.categories or []]
+
+    def match(self, item: dict) -> bool:
+        """Does the item match the predicates
+
+        Args:
+            item (dict): MyCollectItem as dict
+
+        Returns:
+            bool: True if the item matches
+        """
+        if self.categories is not None and item.get("category") not in self.categories:
+            return False
+        if self.providers is not None and item.get("provider") not in self.providers:
+            return False
+        if self.has_article and "article" not in item.get("extra", {}):
+            return False
+        return True
+
+    def prefilter(self, line: bytes) -> bool:
+        """Cheap check on an encoded item, before decoding it.
+        False means the item can't match, True means it needs to be decoded
+
+        Args:
+            line (bytes): the item dumped with json.dumps default separators
+
+        Returns:
+            bool: False if the item can be dropped
+        """
+        if self.has_article and b'"article": ' not in line:
+            return False
+        if self.categories is not None:
+            return any(needle in line for needle in self._needles)
+        return True
+
+
+def project(item: dict, fields: Optional[List[str]]) -> dict:
+    """Keeps only the listed extra fields of an item
+
+    Args:
+        item (dict): MyCollectItem as dict
+        fields (Optional[List[str]]): extra fields to keep, None keeps them all
+
+    Returns:
+        dict: the projected item
+    """
+    if fields is not None and "extra" in item:
+        item["extra"] = {key: value for key, value in item["extra"].items() if key in fields}
+    return item
+
+
 class Storage(metaclass=abc.ABCMeta):
     """
         Datamanager base class
@@ -18,7 +84,24 @@ class Storage(metaclass=abc.ABCMeta):
             Store some data
         """
 
-    def fetch_items(self, timestamp: int) -> Iterable[MyCollectItem]:
+    def store_items(self, items: List[MyCollectItem]) -> None:
+        """
+            Store a batch of items, defaults to store_item on each item
+        """
+        for item in items:
+            self.store_item(item)
+
+    def fetch_items(self, timestamp: int, end_timestamp: Optional[int] = None,
+                    item_filter: Optional[ItemFilter] = None,
+                    fields: Optional[List[str]] = None) -> Iterable[MyCollectItem]:
+        """
+            Read raw data stored from timestamp, until end_timestamp if provided.
+            Storages drop the items that don't match item_filter
+            and only load the extra fields listed in fields
+        """
+
+    def close(self) -> None:
         """
-            Read raw data
+            Releases the resources held by the storage,
+            pending writes must be persisted before returning
         """
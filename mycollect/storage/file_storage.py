@@ -2,60 +2,709 @@
     File storage stores data into files
     One folder per provider, one file per day
 """
+import abc
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import datetime
+import functools
+import gzip
+import io
 import json
 import os
+import queue
+import re
+import shutil
+import sys
+import threading
+from typing import Callable, Deque, Dict, IO, Iterator, List, Optional, Tuple
 
-from mycollect.storage import Storage
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+from mycollect.storage import ItemFilter, Storage, project
 from mycollect.structures import MyCollectItem
 from mycollect.logger import create_logger
 
 
+class BufferedFileWriter():  # pylint:disable=too-many-instance-attributes
+
+    """Keeps one open handle per folder and writes the lines by batch
+    from a background thread
+    """
+
+    def __init__(self, flush_size: int = 500, flush_interval: float = 1.0):
+        """BufferedFileWriter ctor
+
+        Args:
+            flush_size (int, optional): number of pending lines that triggers a flush.
+                Defaults to 500.
+            flush_interval (float, optional): maximum seconds between two flushes.
+                Defaults to 1.0.
+        """
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._logger = create_logger()
+        self._pending: Dict[str, List[str]] = defaultdict(list)
+        self._pending_count = 0
+        self._handles: Dict[str, IO] = {}
+        self._pending_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake_up = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, file_path: str, line: str) -> None:
+        """Adds a line to the pending lines of the file
+
+        Args:
+            file_path (str): path of the file
+            line (str): line to append, including the line separator
+        """
+        with self._pending_lock:
+            if self._closed:
+                raise ValueError("writer is closed")
+            self._pending[file_path].append(line)
+            self._pending_count += 1
+            if self._pending_count >= self._flush_size:
+                self._wake_up.set()
+
+    def flush(self) -> None:
+        """Writes all pending lines to their files
+        """
+        with self._io_lock:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        with self._pending_lock:
+            pending = self._pending
+            self._pending = defaultdict(list)
+            self._pending_count = 0
+        for file_path, lines in pending.items():
+            self._get_handle(file_path).write(''.join(lines))
+        for handle in self._handles.values():
+            handle.flush()
+
+    def close_handles(self) -> None:
+        """Flushes the pending lines and closes the open files,
+        they will be reopened on the next write
+        """
+        with self._io_lock:
+            self._flush_pending()
+            for handle in self._handles.values():
+                handle.close()
+            self._handles.clear()
+
+    def close(self) -> None:
+        """Stops the background thread, flushes the pending lines and closes the files
+        """
+        with self._pending_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake_up.set()
+        self._thread.join()
+        self.close_handles()
+
+    def _get_handle(self, file_path: str) -> IO:
+        folder = os.path.dirname(file_path)
+        handle = self._handles.get(folder)
+        if handle is not None and handle.name == file_path:
+            return handle
+        if handle is not None:
+            handle.close()
+        os.makedirs(folder, exist_ok=True)
+        handle = open(file_path, 'a', encoding='utf-8')  # pylint:disable=consider-using-with
+        self._handles[folder] = handle
+        return handle
+
+    def _run(self):
+        while not self._closed:
+            self._wake_up.wait(self._flush_interval)
+            self._wake_up.clear()
+            try:
+                self.flush()
+            except Exception as err:  # pylint:disable=broad-except
+                self._logger.exception(err)
+
+
+class DayFileIndex():
+
+    """Sidecar index of a day file, maps time buckets to the byte offset
+    of their first line so a read can seek instead of scanning the file.
+    The index is stored next to the day file with the .idx extension
+    """
+
+    TIMESTAMP_PREFIX = re.compile(rb'^\{"timestamp": (\d+)')
+
+    def __init__(self, file_path: str, bucket: int = 60):
+        """DayFileIndex ctor
+
+        Args:
+            file_path (str): path of the indexed day file
+            bucket (int, optional): width of a bucket in seconds. Defaults to 60.
+        """
+        self._file_path = file_path
+        self._index_path = file_path + ".idx"
+        self._bucket = bucket
+        self._size = 0
+        self._offsets: Dict[int, int] = {}
+
+    def seek_offset(self, timestamp: int) -> int:
+        """Gets the offset from which the lines may have a timestamp
+        greater or equal to the one provided.
+        The index is loaded, and updated if missing or stale
+
+        Args:
+            timestamp (int): timestamp
+
+        Returns:
+            int: byte offset in the day file
+        """
+        self._refresh()
+        start_bucket = timestamp - timestamp % self._bucket
+        offsets = [offset for bucket, offset in self._offsets.items()
+                   if bucket >= start_bucket]
+        return min(offsets) if offsets else self._size
+
+    def _refresh(self):
+        if not self._offsets:
+            self._load()
+        file_size = os.path.getsize(self._file_path)
+        if file_size < self._size:
+            self._size = 0
+            self._offsets = {}
+        if file_size > self._size:
+            self._extend()
+            self._save()
+
+    def _load(self):
+        try:
+            with open(self._index_path, encoding='utf-8') as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return
+        if index.get("bucket") == self._bucket:
+            self._size = index["size"]
+            self._offsets = {int(bucket): offset for bucket, offset in index["offsets"]}
+
+    def _extend(self):
+        with open(self._file_path, 'rb') as input_file:
+            input_file.seek(self._size)
+            offset = self._size
+            for line in input_file:
+                if not line.endswith(b'\n'):
+                    break
+                timestamp = self.get_timestamp(line)
+                if timestamp is not None:
+                    bucket = timestamp - timestamp % self._bucket
+                    if bucket not in self._offsets:
+                        self._offsets[bucket] = offset
+                offset += len(line)
+        self._size = offset
+
+    def _save(self):
+        temp_path = self._index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as index_file:
+            json.dump({
+                "bucket": self._bucket,
+                "size": self._size,
+                "offsets": sorted(self._offsets.items())
+            }, index_file)
+        os.replace(temp_path, self._index_path)
+
+    @staticmethod
+    def get_timestamp(line: bytes) -> Optional[int]:
+        """Gets the timestamp of a line without decoding the whole line if possible
+
+        Args:
+            line (bytes): a line of a day file
+
+        Returns:
+            Optional[int]: the timestamp, None if the line is invalid
+        """
+        match = DayFileIndex.TIMESTAMP_PREFIX.match(line)
+        if match:
+            return int(match.group(1))
+        try:
+            return json.loads(line)["timestamp"]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+class SegmentCodec(metaclass=abc.ABCMeta):
+
+    """Compression of the sealed segments.
+    A segment is a sequence of independent frames, a reader can start
+    at the beginning of any frame and read until the end of the segment
+    """
+
+    extension = ""
+
+    @abc.abstractmethod
+    def compress_frame(self, data: bytes) -> bytes:
+        """Compress a frame
+
+        Args:
+            data (bytes): lines of the frame
+
+        Returns:
+            bytes: the compressed frame
+        """
+
+    @abc.abstractmethod
+    def open_stream(self, raw_file: IO) -> IO:
+        """Decompress a segment from the current position of the file
+
+        Args:
+            raw_file (IO): segment file opened in binary mode
+
+        Returns:
+            IO: decompressed binary stream
+        """
+
+
+class GzipCodec(SegmentCodec):
+
+    """Frames are gzip members
+    """
+
+    extension = ".gz"
+
+    def compress_frame(self, data: bytes) -> bytes:
+        return gzip.compress(data)
+
+    def open_stream(self, raw_file: IO) -> IO:
+        return gzip.GzipFile(fileobj=raw_file, mode='rb')  # type: ignore
+
+
+class ZstdCodec(SegmentCodec):
+
+    """Frames are zstd frames, requires the zstandard package
+    """
+
+    extension = ".zst"
+
+    def __init__(self):
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        self._compressor = zstandard.ZstdCompressor()
+
+    def compress_frame(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def open_stream(self, raw_file: IO) -> IO:
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            raw_file, read_across_frames=True)
+        return io.BufferedReader(reader)
+
+
+CODECS = {
+    "gzip": GzipCodec,
+    "zstd": ZstdCodec
+}
+
+
+class SegmentIndex():
+
+    """Sidecar index of a sealed segment, lists the offset of each frame
+    and the greatest timestamp it contains
+    """
+
+    def __init__(self, segment_path: str):
+        self._index_path = segment_path + ".idx"
+
+    def seek_offset(self, timestamp: int) -> int:
+        """Gets the offset of the first frame that contains a line
+        with a timestamp greater or equal to the one provided
+
+        Args:
+            timestamp (int): timestamp
+
+        Returns:
+            int: byte offset in the segment, 0 if the index is missing
+        """
+        frames = self.load()
+        for offset, max_timestamp in frames:
+            if max_timestamp >= timestamp:
+                return offset
+        return frames[-1][0] if frames else 0
+
+    def load(self) -> List[Tuple[int, int]]:
+        """Loads the frames of the segment
+
+        Returns:
+            List[Tuple[int, int]]: offset and greatest timestamp of each frame,
+                empty if the index is missing
+        """
+        try:
+            with open(self._index_path, encoding='utf-8') as index_file:
+                return [tuple(frame) for frame in json.load(index_file)["frames"]]  # type: ignore
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def save(self, frames: List[Tuple[int, int]]) -> None:
+        """Saves the frames of the segment
+
+        Args:
+            frames (List[Tuple[int, int]]): offset and greatest timestamp of each frame
+        """
+        temp_path = self._index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as index_file:
+            json.dump({"frames": frames}, index_file)
+        os.replace(temp_path, self._index_path)
+
+
 class FileStorage(Storage):
     """
         FileStorage class
         One folder per provider, one file per day
     """
 
-    def __init__(self, folder: str):
+    # lines are appended in timestamp order, give or take the writers contention
+    ORDER_TOLERANCE = 60
+    DAY_FILE = re.compile(r'^\d{4}_\d{2}_\d{2}\.jsonl')
+
+    def __init__(self, folder: str, buffered: bool = False,  # pylint:disable=too-many-arguments
+                 flush_size: int = 500, flush_interval: float = 1.0, index_bucket: int = 60,
+                 compression: Optional[str] = None, frame_size: int = 1024 * 1024,
+                 fetch_workers: int = 0, fetch_ordered: bool = True, fetch_chunk: int = 500):
+        """FileStorage ctor
+
+        Args:
+            folder (str): root folder of the storage
+            buffered (bool, optional): keeps the files open and writes the items by batch
+                from a background thread. Defaults to False.
+            flush_size (int, optional): buffered mode, number of pending items
+                that triggers a write. Defaults to 500.
+            flush_interval (float, optional): buffered mode, maximum seconds
+                an item stays in memory. Defaults to 1.0.
+            index_bucket (int, optional): width in seconds of the buckets of the sidecar
+                index used to seek in the day files, 0 disables the index. Defaults to 60.
+            compression (str, optional): gzip or zstd, day files of the previous days
+                are sealed into compressed segments. Defaults to None.
+            frame_size (int, optional): uncompressed bytes per frame of a segment,
+                reads seek to the first relevant frame. Defaults to 1MiB.
+            fetch_workers (int, optional): number of threads decoding the day files
+                in parallel during a fetch, 0 reads them one by one. Defaults to 0.
+            fetch_ordered (bool, optional): parallel fetch, yields the items per provider
+                and per day like the sequential fetch. Defaults to True.
+            fetch_chunk (int, optional): parallel fetch, items handed over at once by a worker.
+                At most 4 chunks per worker are held in memory, and in ordered mode
+                at most 4 chunks for each of the 2 * fetch_workers files read ahead.
+                Defaults to 500.
+        """
         os.makedirs(folder, exist_ok=True)
         self._folder = folder
         self._logger = create_logger()
+        self._index_bucket = index_bucket
+        self._writer: Optional[BufferedFileWriter] = None
+        if buffered:
+            self._writer = BufferedFileWriter(flush_size, flush_interval)
+        self._codec: Optional[SegmentCodec] = None
+        if compression:
+            if compression not in CODECS:
+                raise ValueError(f"unknown compression {compression}")
+            self._codec = CODECS[compression]()
+        self._frame_size = frame_size
+        self._fetch_workers = fetch_workers
+        self._fetch_ordered = fetch_ordered
+        self._fetch_chunk = fetch_chunk
+        self._seal_lock = threading.Lock()
+        self._seal_thread: Optional[threading.Thread] = None
+        # held while the items are handed to the files, and by seal to close them
+        self._write_lock = threading.Lock()
+        self._current_day = datetime.date.today()
+        if self._codec:
+            self.seal()
 
     def store_item(self, item: MyCollectItem) -> None:
-        if not item.provider:
+        self.store_items([item])
+
+    def store_items(self, items: List[MyCollectItem]) -> None:
+        data = [item.to_dict() for item in items if item.provider]
+        if len(data) < len(items):
             self._logger.warning("empty provider")
+        with self._write_lock:
+            # the day of the files is taken with the lock, a sealed day is never written again
+            now = datetime.datetime.now()
+            if self._codec and now.date() != self._current_day:
+                self._current_day = now.date()
+                self._seal_thread = threading.Thread(target=self.seal, daemon=True)
+                self._seal_thread.start()
+            timestamp = round(now.timestamp())
+            lines: Dict[str, List[str]] = defaultdict(list)
+            for item_data in data:
+                item_to_dump = {
+                    "timestamp": timestamp,
+                    "data": item_data
+                }
+                lines[self._get_file_path(item_data["provider"], timestamp)].append(
+                    json.dumps(item_to_dump) + '\n')
+            for file_path, file_lines in lines.items():
+                if self._writer:
+                    for line in file_lines:
+                        self._writer.write(file_path, line)
+                    continue
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, 'a', encoding='utf-8') as output_file:
+                    output_file.write(''.join(file_lines))
+
+    def fetch_items(self, timestamp: int, end_timestamp: Optional[int] = None,
+                    item_filter: Optional[ItemFilter] = None,
+                    fields: Optional[List[str]] = None):
+        if self._writer:
+            self._writer.flush()
+        providers = item_filter.providers if item_filter else None
+        file_paths = list(self._get_file_paths(timestamp, end_timestamp, providers))
+        read_file = functools.partial(self._read_file, timestamp=timestamp,
+                                      end_timestamp=end_timestamp,
+                                      item_filter=item_filter, fields=fields)
+        if self._fetch_workers > 0:
+            yield from self._fetch_parallel(file_paths, read_file)
             return
-        provider = item.provider
-        provider_path = os.path.join(self._folder, provider)
-        if not os.path.exists(provider_path):
-            os.makedirs(provider_path)
-        timestamp = round(datetime.datetime.now().timestamp())
-        file_path = self._get_file_path(provider, timestamp)
-        with open(file_path, 'a', encoding='utf-8') as output_file:
-            item_to_dump = {
-                "timestamp": timestamp,
-                "data": item.to_dict()
-            }
-            output_file.write(json.dumps(item_to_dump) + '\n')
-
-    def fetch_items(self, timestamp: int):
+        for file_path in file_paths:
+            yield from read_file(file_path)
+
+    def close(self) -> None:
+        with self._write_lock:
+            seal_thread = self._seal_thread
+        if seal_thread:
+            seal_thread.join()
+        if self._writer:
+            self._writer.close()
+
+    def seal(self) -> None:
+        """Compress the day files of the previous days into segments
+        """
+        if not self._codec:
+            return
+        with self._seal_lock:
+            with self._write_lock:
+                # the writes after this point go to the files of today or later
+                if self._writer:
+                    self._writer.close_handles()
+                today = datetime.date.today().strftime("%Y_%m_%d.jsonl")
+            for provider in os.listdir(self._folder):
+                provider_path = os.path.join(self._folder, provider)
+                if not os.path.isdir(provider_path):
+                    # other files can share the folder, like a sqlite database
+                    continue
+                # the files of a day being sealed are found from their name
+                days = {match.group(0) for match in map(self.DAY_FILE.match,
+                                                        os.listdir(provider_path)) if match}
+                for file_name in sorted(days):
+                    if file_name < today:
+                        try:
+                            self._seal_file(os.path.join(provider_path, file_name))
+                        except OSError as err:
+                            self._logger.exception(err)
+
+    def _seal_file(self, file_path: str):
+        # the day file is renamed .sealing, merged with the segment into a temporary
+        # segment and index, the segment is replaced, then the .sealing file is removed
+        # and the index replaced: the files left by an interrupted seal tell how far it went
+        codec: SegmentCodec = self._codec  # type: ignore
+        segment_path = file_path + codec.extension
+        temp_path = segment_path + ".tmp"
+        if os.path.exists(temp_path):
+            # the segment was not replaced, the .sealing file is merged again
+            os.remove(temp_path)
+            if os.path.exists(temp_path + ".idx"):
+                os.remove(temp_path + ".idx")
+        elif os.path.exists(temp_path + ".idx"):
+            # the segment was replaced, only the cleanup is missing
+            self._end_seal(file_path)
+        if os.path.exists(file_path + ".sealing"):
+            self._merge_sealing(file_path)
+        if os.path.exists(file_path):
+            os.replace(file_path, file_path + ".sealing")
+            self._merge_sealing(file_path)
+
+    def _merge_sealing(self, file_path: str):
+        codec: SegmentCodec = self._codec  # type: ignore
+        segment_path = file_path + codec.extension
+        temp_path = segment_path + ".tmp"
+        frames: List[Tuple[int, int]] = []
+        with open(file_path + ".sealing", 'rb') as input_file, \
+                open(temp_path, 'wb') as output_file:
+            if os.path.exists(segment_path):
+                # the frames are independent, the lines written after a seal are appended
+                with open(segment_path, 'rb') as segment_file:
+                    shutil.copyfileobj(segment_file, output_file)
+                frames = SegmentIndex(segment_path).load() or [(0, sys.maxsize)]
+            for lines, max_timestamp in self._iter_frames(input_file):
+                frames.append((output_file.tell(), max_timestamp))
+                output_file.write(codec.compress_frame(b''.join(lines)))
+        SegmentIndex(temp_path).save(frames)
+        os.replace(temp_path, segment_path)
+        self._end_seal(file_path)
+        self._logger.info("day file sealed", file=file_path, frames=len(frames))
+
+    def _end_seal(self, file_path: str):
+        segment_path = file_path + self._codec.extension  # type: ignore
+        if os.path.exists(file_path + ".sealing"):
+            os.remove(file_path + ".sealing")
+        os.replace(segment_path + ".tmp.idx", segment_path + ".idx")
+        if os.path.exists(file_path + ".idx"):
+            os.remove(file_path + ".idx")
+
+    def _iter_frames(self, input_file: IO) -> Iterator[Tuple[List[bytes], int]]:
+        lines: List[bytes] = []
+        size = 0
+        max_timestamp = 0
+        for line in input_file:
+            if not line.endswith(b'\n'):
+                line += b'\n'
+            lines.append(line)
+            size += len(line)
+            max_timestamp = max(max_timestamp, DayFileIndex.get_timestamp(line) or 0)
+            if size >= self._frame_size:
+                yield lines, max_timestamp
+                lines, size, max_timestamp = [], 0, 0
+        if lines:
+            yield lines, max_timestamp
+
+    def _get_file_paths(self, timestamp: int, end_timestamp: Optional[int],
+                        providers: Optional[List[str]]) -> Iterator[str]:
+        end_date = datetime.datetime.now().date()
+        if end_timestamp is not None:
+            end_date = min(end_date, datetime.datetime.fromtimestamp(end_timestamp).date())
         for provider in os.listdir(self._folder):
+            if providers is not None and provider not in providers:
+                continue
+            if not os.path.isdir(os.path.join(self._folder, provider)):
+                continue
             current_date = datetime.datetime.fromtimestamp(timestamp)
-            while current_date.date() <= datetime.datetime.now().date():
-                file_path = self._get_file_path(
-                    provider, round(current_date.timestamp()))
-                if os.path.exists(file_path):
-                    with open(file_path, encoding='utf-8') as input_file:
-                        for line in input_file:
-                            try:
-                                item = json.loads(line)
-                                if item["timestamp"] >= timestamp:
-                                    yield MyCollectItem.from_dict(item["data"])
-                            except json.decoder.JSONDecodeError:
-                                self._logger.warn(f"Invalid json line in file {file_path}: {line}")
+            while current_date.date() <= end_date:
+                yield self._get_file_path(provider, round(current_date.timestamp()))
                 current_date += datetime.timedelta(days=1)
 
+    def _fetch_parallel(self, file_paths: List[str], read_file: Callable):
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self._fetch_workers)
+        futures: List[Future] = []
+        try:
+            if self._fetch_ordered:
+                # workers start in file order, the consumer always waits on a started file,
+                # the files are submitted as the consumer moves forward to bound the read ahead
+                read_ahead = 2 * self._fetch_workers
+                queues: Deque[queue.Queue] = deque()
+                for file_path in file_paths:
+                    if len(queues) >= read_ahead:
+                        yield from self._drain_queue(queues.popleft(), 1)
+                    queues.append(queue.Queue(maxsize=4))
+                    futures.append(executor.submit(
+                        self._decode_file, read_file, file_path, queues[-1], stop))
+                while queues:
+                    yield from self._drain_queue(queues.popleft(), 1)
+            else:
+                shared_queue: queue.Queue = queue.Queue(maxsize=4 * self._fetch_workers)
+                for file_path in file_paths:
+                    futures.append(executor.submit(
+                        self._decode_file, read_file, file_path, shared_queue, stop))
+                yield from self._drain_queue(shared_queue, len(file_paths))
+        finally:
+            stop.set()
+            # cancel_futures of shutdown requires python 3.9
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _drain_queue(items_queue: queue.Queue, producers: int):
+        while producers > 0:
+            chunk = items_queue.get()
+            if chunk is None:
+                producers -= 1
+            elif isinstance(chunk, Exception):
+                raise chunk
+            else:
+                yield from chunk
+
+    def _decode_file(self, read_file: Callable, file_path: str,
+                     items_queue: queue.Queue, stop: threading.Event):
+        def put(value) -> bool:
+            while not stop.is_set():
+                try:
+                    items_queue.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        if stop.is_set():
+            return
+        chunk: List[MyCollectItem] = []
+        try:
+            for item in read_file(file_path):
+                chunk.append(item)
+                if len(chunk) >= self._fetch_chunk:
+                    if not put(chunk):
+                        return
+                    chunk = []
+            if chunk:
+                put(chunk)
+        except Exception as err:  # pylint:disable=broad-except
+            put(err)
+        finally:
+            put(None)
+
+    def _read_file(self, file_path: str, timestamp: int,  # pylint:disable=too-many-arguments
+                   end_timestamp: Optional[int] = None,
+                   item_filter: Optional[ItemFilter] = None,
+                   fields: Optional[List[str]] = None):
+        for line in self._read_lines(file_path, timestamp):
+            match = DayFileIndex.TIMESTAMP_PREFIX.match(line)
+            line_timestamp = int(match.group(1)) if match else timestamp
+            if line_timestamp < timestamp:
+                continue
+            if end_timestamp is not None and line_timestamp > end_timestamp:
+                if line_timestamp > end_timestamp + self.ORDER_TOLERANCE:
+                    break
+                continue
+            if item_filter and not item_filter.prefilter(line):
+                continue
+            try:
+                item = json.loads(line)
+                if item["timestamp"] < timestamp or \
+                        (end_timestamp is not None and item["timestamp"] > end_timestamp):
+                    continue
+                if item_filter and not item_filter.match(item["data"]):
+                    continue
+                yield MyCollectItem.from_dict(project(item["data"], fields))
+            except json.decoder.JSONDecodeError:
+                self._logger.warn(
+                    f"Invalid json line in file {file_path}: {line.decode(errors='replace')}")
+
+    def _read_lines(self, file_path: str, timestamp: int) -> Iterator[bytes]:
+        # a day being sealed is read from its .sealing file until the seal ends
+        for day_path in (file_path, file_path + ".sealing"):
+            try:
+                offset = 0
+                if self._index_bucket and day_path == file_path:
+                    offset = DayFileIndex(file_path, self._index_bucket).seek_offset(timestamp)
+                with open(day_path, 'rb') as input_file:
+                    input_file.seek(offset)
+                    yield from input_file
+                return
+            except FileNotFoundError:
+                # missing, or sealed in the meantime
+                continue
+        # a day has a single segment, the one of the configured codec first
+        codecs = sorted(CODECS.values(),
+                        key=lambda codec_class: not isinstance(self._codec, codec_class))
+        for codec_class in codecs:
+            segment_path = file_path + codec_class.extension
+            if os.path.exists(segment_path):
+                offset = SegmentIndex(segment_path).seek_offset(timestamp)
+                with open(segment_path, 'rb') as input_file:
+                    input_file.seek(offset)
+                    yield from codec_class().open_stream(input_file)
+                return
+
     def _get_file_path(self, provider, timestamp: int):
         provider_path = os.path.join(self._folder, provider)
         date = datetime.datetime.fromtimestamp(timestamp)
@@ -1,21 +1,44 @@
 """Influx db storage
 This storage is write only
 """
+from collections import deque
 import socket
+import threading
+import time
+from typing import Deque, Dict, List
 
-from influxdb.client import InfluxDBClient, InfluxDBClientError  # type: ignore
+from influxdb.client import InfluxDBClient, InfluxDBClientError, InfluxDBServerError  # type: ignore
+import requests
 
 from mycollect.storage import Storage
 from mycollect.structures import MyCollectItem
 from mycollect.logger import create_logger
 
 
-class InfluxDBStorage(Storage):
+class InfluxDBStorage(Storage):  # pylint:disable=too-many-instance-attributes
 
     """InfluxDB store only storage
+    Points are buffered and written by batch from a background thread
     """
 
     def __init__(self, **kwargs):
+        """InfluxDBStorage ctor
+
+        Keyword Args:
+            host, port, username, password, database: InfluxDB connection
+            retention (str, optional): retention of the points. Defaults to 30d.
+            batch_size (int, optional): maximum points per write. Defaults to 100.
+            flush_interval (float, optional): maximum seconds a point stays in the buffer.
+                Defaults to 1.0.
+            max_buffer (int, optional): maximum buffered points, new points are dropped
+                above this size. Defaults to 10000.
+            max_backoff (float, optional): maximum seconds between two retries
+                while the server is down. Only the connection errors, the server errors
+                and the 429 status are retried, the batches refused with another status
+                are dropped. Defaults to 60.
+            close_timeout (float, optional): maximum seconds spent writing
+                the remaining points on close. Defaults to 10.
+        """
         self._logger = create_logger()
         self._hostname = socket.gethostname()
         self._client = InfluxDBClient(
@@ -38,19 +61,109 @@ class InfluxDBStorage(Storage):
                 default=True)
         except InfluxDBClientError as err:
             self._logger.exception(err)
+        self._batch_size = kwargs.get("batch_size", 100)
+        self._flush_interval = kwargs.get("flush_interval", 1.0)
+        self._max_buffer = kwargs.get("max_buffer", 10000)
+        self._max_backoff = kwargs.get("max_backoff", 60)
+        self._close_timeout = kwargs.get("close_timeout", 10)
+        self._buffer: Deque[dict] = deque()
+        self._condition = threading.Condition()
+        self._counters = {"written": 0, "dropped": 0, "retries": 0}
+        self._close_deadline = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
 
     def store_item(self, item: MyCollectItem) -> None:
+        self.store_items([item])
+
+    def store_items(self, items: List[MyCollectItem]) -> None:
+        points = [self._to_point(item) for item in items]
+        with self._condition:
+            accepted = 0 if self._close_deadline else \
+                max(0, min(len(points), self._max_buffer - len(self._buffer)))
+            self._counters["dropped"] += len(points) - accepted
+            self._buffer.extend(points[:accepted])
+            if len(self._buffer) >= self._batch_size:
+                self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """Gets the counters of this storage
+
+        Returns:
+            Dict[str, int]: buffered, written, dropped points and write retries
+        """
+        with self._condition:
+            return dict(self._counters, buffered=len(self._buffer))
+
+    def close(self) -> None:
+        with self._condition:
+            if self._close_deadline:
+                return
+            self._close_deadline = time.monotonic() + self._close_timeout
+            self._condition.notify()
+        self._thread.join()
+
+    @staticmethod
+    def _to_point(item: MyCollectItem) -> dict:
         has_article = "article" in item.extra
         fields = item.to_dict()
         fields.pop("extra", None)
-        self._client.write_points([
-            {
-                "measurement": "mycollect_item",
-                "tags": {
-                    "provider": item.provider,
-                    "category": item.category,
-                    "hasArticle": has_article
-                },
-                "fields": fields
-            }]
-        )
+        return {
+            "measurement": "mycollect_item",
+            "tags": {
+                "provider": item.provider,
+                "category": item.category,
+                "hasArticle": has_article
+            },
+            "time": time.time_ns(),
+            "fields": fields
+        }
+
+    @staticmethod
+    def _is_retryable(err: Exception) -> bool:
+        if isinstance(err, InfluxDBServerError):
+            return True
+        if isinstance(err, InfluxDBClientError):
+            return err.code == 429
+        return isinstance(err, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            with self._condition:
+                if not self._close_deadline and len(self._buffer) < self._batch_size:
+                    self._condition.wait(self._flush_interval)
+                if self._close_deadline and not self._buffer:
+                    return
+                batch = [self._buffer[i] for i in range(min(self._batch_size, len(self._buffer)))]
+            if not batch:
+                continue
+            try:
+                self._client.write_points(batch, time_precision="n")
+            except Exception as err:  # pylint:disable=broad-except
+                if not self._is_retryable(err):
+                    # the server refuses these points, retrying can't succeed
+                    self._logger.error("points refused", error=str(err), points=len(batch))
+                    with self._condition:
+                        for _ in batch:
+                            self._buffer.popleft()
+                        self._counters["dropped"] += len(batch)
+                    continue
+                backoff = min(max(backoff * 2, 1.0), self._max_backoff)
+                self._logger.error("unable to write points", error=str(err),
+                                   points=len(batch), retry_in=backoff)
+                with self._condition:
+                    self._counters["retries"] += 1
+                    if self._close_deadline and time.monotonic() >= self._close_deadline:
+                        self._counters["dropped"] += len(self._buffer)
+                        self._buffer.clear()
+                        return
+                    retry_at = time.monotonic() + backoff
+                    while not self._close_deadline and time.monotonic() < retry_at:
+                        self._condition.wait(retry_at - time.monotonic())
+                continue
+            backoff = 0.0
+            with self._condition:
+                for _ in batch:
+                    self._buffer.popleft()
+                self._counters["written"] += len(batch)
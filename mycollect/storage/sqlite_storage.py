@@ -0,0 +1,191 @@
+"""
+    SQLite storage stores data into a single table
+    indexed on timestamp, provider, category and url
+"""
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+from mycollect.storage import ItemFilter, Storage
+from mycollect.structures import MyCollectItem
+from mycollect.logger import create_logger
+
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS items (
+        id INTEGER PRIMARY KEY,
+        timestamp INTEGER NOT NULL,
+        provider TEXT,
+        category TEXT,
+        url TEXT,
+        text TEXT,
+        has_article INTEGER NOT NULL DEFAULT 0,
+        extra TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS items_timestamp ON items (timestamp)",
+    "CREATE INDEX IF NOT EXISTS items_provider ON items (provider, timestamp)",
+    "CREATE INDEX IF NOT EXISTS items_category ON items (category, timestamp)",
+    "CREATE INDEX IF NOT EXISTS items_url ON items (url)"
+]
+
+
+class SQLiteStorage(Storage):  # pylint:disable=too-many-instance-attributes
+    """
+        SQLiteStorage class
+        Items are written by batch in a single transaction from a background thread
+    """
+
+    def __init__(self, path: str, batch_size: int = 500,  # pylint:disable=too-many-arguments
+                 flush_interval: float = 1.0, max_pending: int = 100000, timeout: float = 5.0):
+        """SQLiteStorage ctor
+
+        Args:
+            path (str): path of the database file
+            batch_size (int, optional): number of pending items that triggers a write.
+                Defaults to 500.
+            flush_interval (float, optional): maximum seconds an item stays in memory.
+                Defaults to 1.0.
+            max_pending (int, optional): maximum items kept in memory while the writes fail,
+                the oldest ones are dropped above. Defaults to 100000.
+            timeout (float, optional): seconds waiting for a lock on the database.
+                Defaults to 5.0.
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._logger = create_logger()
+        self._connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+        self._pending: List[Tuple] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake_up = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def store_item(self, item: MyCollectItem) -> None:
+        self.store_items([item])
+
+    def store_items(self, items: List[MyCollectItem]) -> None:
+        timestamp = round(datetime.datetime.now().timestamp())
+        rows = [(timestamp, item.provider, item.category, item.url, item.text,
+                 "article" in item.extra, json.dumps(item.extra)) for item in items]
+        with self._pending_lock:
+            if self._closed:
+                raise ValueError("storage is closed")
+            self._pending.extend(rows)
+            if len(self._pending) >= self._batch_size:
+                self._wake_up.set()
+
+    def fetch_items(self, timestamp: int, end_timestamp: Optional[int] = None,
+                    item_filter: Optional[ItemFilter] = None,
+                    fields: Optional[List[str]] = None):
+        self.flush()
+        query, parameters = self._build_query(timestamp, end_timestamp, item_filter, fields)
+        connection = sqlite3.connect(self._path)
+        try:
+            for provider, category, text, url, *extra in connection.execute(query, parameters):
+                item = MyCollectItem(provider=provider, category=category, text=text, url=url)
+                if fields is None:
+                    if extra[0]:
+                        item.extra.update(json.loads(extra[0]))
+                else:
+                    for key, value in zip(fields, extra):
+                        if value is not None:
+                            item.extra[key] = json.loads(value)
+                yield item
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _build_query(timestamp: int, end_timestamp: Optional[int],
+                     item_filter: Optional[ItemFilter],
+                     fields: Optional[List[str]]) -> Tuple[str, list]:
+        columns = ["provider", "category", "text", "url"]
+        parameters: list = []
+        if fields is None:
+            columns.append("extra")
+        for key in fields or []:
+            # json_quote keeps objects as json and encodes the scalars
+            columns.append("CASE WHEN json_type(extra, ?) IS NULL THEN NULL"
+                           " ELSE json_quote(json_extract(extra, ?)) END")
+            parameters += ["$." + json.dumps(key)] * 2
+        conditions = ["timestamp >= ?"]
+        parameters.append(timestamp)
+        if end_timestamp is not None:
+            conditions.append("timestamp <= ?")
+            parameters.append(end_timestamp)
+        if item_filter:
+            for column, values in (("provider", item_filter.providers),
+                                   ("category", item_filter.categories)):
+                if values is not None:
+                    conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                    parameters += values
+            if item_filter.has_article:
+                conditions.append("has_article = 1")
+        query = f"SELECT {', '.join(columns)} FROM items" \
+            f" WHERE {' AND '.join(conditions)} ORDER BY timestamp, id"
+        return query, parameters
+
+    def flush(self) -> None:
+        """Writes the pending items in a single transaction,
+        the items are kept pending if the write fails
+
+        Raises:
+            sqlite3.Error: the write failed
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                pending = self._pending
+                self._pending = []
+            if not pending:
+                return
+            try:
+                with self._connection:
+                    self._connection.executemany(
+                        "INSERT INTO items (timestamp, provider, category, url, text,"
+                        " has_article, extra) VALUES (?, ?, ?, ?, ?, ?, ?)", pending)
+            except sqlite3.Error:
+                with self._pending_lock:
+                    self._pending[:0] = pending
+                    dropped = len(self._pending) - self._max_pending
+                    if dropped > 0:
+                        del self._pending[:dropped]
+                        self._logger.warning("sqlite pending items dropped", dropped=dropped)
+                raise
+
+    def close(self) -> None:
+        with self._pending_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake_up.set()
+        self._thread.join()
+        try:
+            self.flush()
+        except sqlite3.Error as err:
+            self._logger.exception(err)
+            self._logger.error("sqlite pending items lost", lost=len(self._pending))
+        finally:
+            self._connection.close()
+
+    def _run(self):
+        while not self._closed:
+            self._wake_up.wait(self._flush_interval)
+            self._wake_up.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as err:
+                self._logger.exception(err)
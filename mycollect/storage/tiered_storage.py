@@ -0,0 +1,94 @@
+"""
+    Tiered storage keeps the recent items in memory
+    in front of a backing storage
+"""
+from collections import deque
+import datetime
+import json
+import threading
+from typing import Deque, List, Optional, Tuple
+
+from mycollect.storage import ItemFilter, Storage, project
+from mycollect.structures import MyCollectItem
+from mycollect.utils import get_class
+
+
+class TieredStorage(Storage):  # pylint:disable=too-many-instance-attributes
+    """
+        TieredStorage class
+        Items are written to the backing storage and kept encoded in a ring,
+        fetches covered by the ring are served from memory
+    """
+
+    def __init__(self, storage: dict, window: int = 90000, max_bytes: int = 256 * 1024 * 1024):
+        """TieredStorage ctor
+
+        Args:
+            storage (dict): type and args of the backing storage
+            window (int, optional): seconds of items kept in memory. Defaults to 25 hours.
+            max_bytes (int, optional): maximum size of the encoded items kept in memory.
+                Defaults to 256MiB.
+        """
+        self._storage: Storage = get_class(storage["type"])(**storage.get("args", {}))
+        self._window = window
+        self._max_bytes = max_bytes
+        self._ring: Deque[Tuple[int, bytes]] = deque()
+        self._size = 0
+        self._covered_since = round(datetime.datetime.now().timestamp())
+        self._counters = {"memory_fetches": 0, "storage_fetches": 0}
+        self._lock = threading.Lock()
+
+    def store_item(self, item: MyCollectItem) -> None:
+        self.store_items([item])
+
+    def store_items(self, items: List[MyCollectItem]) -> None:
+        self._storage.store_items(items)
+        timestamp = round(datetime.datetime.now().timestamp())
+        lines = [json.dumps({"timestamp": timestamp, "data": item.to_dict()}).encode()
+                 for item in items]
+        with self._lock:
+            for line in lines:
+                self._ring.append((timestamp, line))
+                self._size += len(line)
+            while self._ring and (self._size > self._max_bytes
+                                  or self._ring[0][0] < timestamp - self._window):
+                evicted_timestamp, evicted_line = self._ring.popleft()
+                self._size -= len(evicted_line)
+                self._covered_since = max(self._covered_since, evicted_timestamp + 1)
+
+    def fetch_items(self, timestamp: int, end_timestamp: Optional[int] = None,
+                    item_filter: Optional[ItemFilter] = None,
+                    fields: Optional[List[str]] = None):
+        with self._lock:
+            covered = timestamp >= self._covered_since
+            ring = list(self._ring) if covered else []
+            self._counters["memory_fetches" if covered else "storage_fetches"] += 1
+        if not covered:
+            yield from self._storage.fetch_items(timestamp, end_timestamp=end_timestamp,
+                                                 item_filter=item_filter, fields=fields)
+            return
+        for line_timestamp, line in ring:
+            if line_timestamp < timestamp:
+                continue
+            if end_timestamp is not None and line_timestamp > end_timestamp:
+                break
+            if item_filter and not item_filter.prefilter(line):
+                continue
+            item = json.loads(line)["data"]
+            if item_filter and not item_filter.match(item):
+                continue
+            yield MyCollectItem.from_dict(project(item, fields))
+
+    def stats(self) -> dict:
+        """Gets the state of the memory tier
+
+        Returns:
+            dict: items and bytes in memory, first covered timestamp
+                and number of fetches served by each tier
+        """
+        with self._lock:
+            return dict(self._counters, items=len(self._ring), bytes=self._size,
+                        covered_since=self._covered_since)
+
+    def close(self) -> None:
+        self._storage.close()
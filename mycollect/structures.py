@@ -15,6 +15,7 @@ class MyCollectItem():
         self._url = url
         self._provider = provider
         self._extra: dict = {}
+        self._low_priority = False
 
     @property
     def category(self) -> Optional[str]:
@@ -52,6 +53,17 @@ class MyCollectItem():
         """
         return self._extra
 
+    @property
+    def low_priority(self) -> bool:
+        """Returns whether this item can be shed by a saturated pipeline,
+        a scheduling hint that is not stored
+        """
+        return self._low_priority
+
+    @low_priority.setter
+    def low_priority(self, value):
+        self._low_priority = value
+
     @property
     def provider(self) -> Optional[str]:
         """Gets the provider of this item
@@ -0,0 +1,147 @@
+"""Matches the text of the tweets against the tracks and their filters,
+every word is searched at once with an Aho-Corasick automaton
+"""
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class TrackMatcher():
+
+    """Finds the best track of a text: the track with the most words,
+    all of them found in the text, the first one wins the ties.
+    Words and filters are matched as substrings of the lowercased text
+    """
+
+    def __init__(self, track: List[str], filters: Dict[str, List[str]]):
+        """TrackMatcher ctor
+
+        Args:
+            track (List[str]): tracks, as returned by parse_track
+            filters (Dict[str, List[str]]): filters per track, as returned by parse_track
+        """
+        self._track = track
+        self._patterns: Dict[str, int] = {}
+        self._track_words: List[int] = []
+        self._track_lengths: List[int] = []
+        self._tracks_by_pattern: Dict[int, List[int]] = {}
+        self._unconditional: List[int] = []
+        for index, search in enumerate(track):
+            words = set(search.split())
+            self._track_words.append(len(words))
+            self._track_lengths.append(len(search.split()))
+            if not words:
+                self._unconditional.append(index)
+            for word in words:
+                self._tracks_by_pattern.setdefault(self._add_pattern(word), []).append(index)
+        self._filter_patterns = {search: [self._add_pattern(word) for word in words if word]
+                                 for search, words in filters.items()}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._outputs: List[Tuple[int, ...]] = [()]
+        self._fail: List[int] = []
+        self._build()
+
+    def best_track(self, text: str) -> Optional[str]:
+        """Gets the best track of a text
+
+        Args:
+            text (str): text
+
+        Returns:
+            Optional[str]: the track, None if no track matches
+        """
+        found, _ = self._scan(text.lower(), 0)
+        return self._select(found)
+
+    def match_filter(self, search: str, text: str) -> bool:
+        """Does the text match a filter of the track
+
+        Args:
+            search (str): the track
+            text (str): text
+
+        Returns:
+            bool: True if it matches a filter, False otherwise
+        """
+        if not self._filter_patterns.get(search):
+            return False
+        lower_text = text.lower()
+        _, found = self._scan(lower_text, len(lower_text))
+        return any(pattern in found for pattern in self._filter_patterns[search])
+
+    def resolve(self, text: str, filtered_text: str) -> Tuple[Optional[str], bool]:
+        """Gets the best track of a text and checks its filters, in a single pass
+        when the filtered text starts the text
+
+        Args:
+            text (str): text searched for the tracks
+            filtered_text (str): text searched for the filters of the best track
+
+        Returns:
+            Tuple[Optional[str], bool]: the track, None if no track matches,
+                and True if the filtered text matches a filter of this track
+        """
+        lower_text = text.lower()
+        lower_filtered = filtered_text.lower()
+        if not lower_text.startswith(lower_filtered):
+            search = self.best_track(text)
+            return search, search is not None and self.match_filter(search, filtered_text)
+        found, found_filtered = self._scan(lower_text, len(lower_filtered))
+        search = self._select(found)
+        if search is None:
+            return None, False
+        return search, any(pattern in found_filtered
+                           for pattern in self._filter_patterns.get(search, []))
+
+    def _add_pattern(self, word: str) -> int:
+        return self._patterns.setdefault(word, len(self._patterns))
+
+    def _build(self):
+        for word, pattern in self._patterns.items():
+            state = 0
+            for char in word:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._outputs.append(())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._outputs[state] += (pattern,)
+        self._fail = [0] * len(self._goto)
+        states = deque(self._goto[0].values())
+        while states:
+            state = states.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # a state also ends the words ending its longest proper suffix
+                self._outputs[next_state] += self._outputs[self._fail[next_state]]
+                states.append(next_state)
+
+    def _scan(self, text: str, filtered_length: int) -> Tuple[Set[int], Set[int]]:
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found: Set[int] = set()
+        found_filtered: Set[int] = set()
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+                if position < filtered_length:
+                    found_filtered.update(outputs[state])
+        return found, found_filtered
+
+    def _select(self, found: Set[int]) -> Optional[str]:
+        matched_words: Dict[int, int] = {}
+        for pattern in found:
+            for index in self._tracks_by_pattern.get(pattern, []):
+                matched_words[index] = matched_words.get(index, 0) + 1
+        candidates = self._unconditional + [index for index, count in matched_words.items()
+                                            if count == self._track_words[index]]
+        if not candidates:
+            return None
+        # most words first, then the first track
+        best = min(candidates, key=lambda index: (-self._track_lengths[index], index))
+        return self._track[best]
@@ -0,0 +1,253 @@
+"""Resolves the shortened urls
+"""
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mycollect.cache import LruCache
+from mycollect.logger import create_logger
+from mycollect.structures import MyCollectItem
+
+
+DEFAULT_SHORTENERS = [
+    "amzn.to", "apple.co", "bbc.in", "bit.ly", "bitly.com", "buff.ly", "cnn.it", "cutt.ly",
+    "dlvr.it", "econ.st", "fb.me", "goo.gl", "ift.tt", "is.gd", "j.mp", "lnkd.in", "msft.it",
+    "nyti.ms", "ow.ly", "rebrand.ly", "reut.rs", "shorturl.at", "spoti.fi", "t.co", "t.ly",
+    "tiny.cc", "tinyurl.com", "trib.al", "wapo.st", "wp.me", "youtu.be"
+]
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+PERMANENT_REDIRECT_CODES = (301, 308)
+# servers refusing HEAD requests
+HEAD_REFUSED_CODES = (400, 403, 405, 501)
+
+
+class Unshortener():  # pylint:disable=too-many-instance-attributes
+
+    """Follows the redirections of shortened urls with HEAD requests
+    on a pooled session, results are cached
+    """
+
+    def __init__(self, shorteners: List[str] = None,  # pylint:disable=too-many-arguments
+                 resolve_all: bool = False, timeout: float = 10, max_redirects: int = 10,
+                 cache_size: int = 10000, cache_ttl: float = 24 * 3600, pool_size: int = 10):
+        """Unshortener ctor
+
+        Args:
+            shorteners (List[str], optional): hostnames of the url shorteners.
+                Defaults to DEFAULT_SHORTENERS.
+            resolve_all (bool, optional): follows the redirections of all urls,
+                not only the shorteners ones. Defaults to False.
+            timeout (float, optional): seconds to connect and to read a response. Defaults to 10.
+            max_redirects (int, optional): maximum redirections followed. Defaults to 10.
+            cache_size (int, optional): maximum resolved urls kept in memory. Defaults to 10000.
+            cache_ttl (float, optional): seconds a resolved url is kept. Defaults to 1 day.
+            pool_size (int, optional): connections kept alive per host. Defaults to 10.
+        """
+        self._shorteners = set(shorteners if shorteners is not None else DEFAULT_SHORTENERS)
+        self._resolve_all = resolve_all
+        self._timeout = timeout
+        self._max_redirects = max_redirects
+        self._cache = LruCache("unshortener", max_items=cache_size, ttl=cache_ttl)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._counters = {"resolved": 0, "cache_hits": 0, "skipped": 0}
+        self._lock = threading.Lock()
+
+    def unshorten(self, url: str) -> str:
+        """Gets the url targeted by the shortened url
+
+        Args:
+            url (str): url
+
+        Returns:
+            str: the last permanent redirection, the url itself if there is none
+        """
+        if not self._resolve_all and not self.is_shortened(url):
+            self._count("skipped")
+            return url
+        cached = self._cache.get_item(url)
+        if cached is not None:
+            self._count("cache_hits")
+            return cached
+        new_url = self._follow(url)
+        self._cache.set_item(url, new_url)
+        self._count("resolved")
+        return new_url
+
+    def is_shortened(self, url: str) -> bool:
+        """Is the url hosted by a known url shortener
+
+        Args:
+            url (str): url
+
+        Returns:
+            bool: True if the host is a shortener
+        """
+        host = (urlparse(url).hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        return host in self._shorteners
+
+    def stats(self) -> Dict[str, int]:
+        """Gets the counters of this unshortener
+
+        Returns:
+            Dict[str, int]: urls resolved on the network, from the cache,
+                and skipped as not shortened
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _follow(self, url: str) -> str:
+        new_url = url
+        current_url = url
+        for _ in range(self._max_redirects):
+            response = self._request(current_url)
+            if response.status_code not in REDIRECT_CODES or "location" not in response.headers:
+                break
+            current_url = urljoin(current_url, response.headers["location"])
+            if response.status_code in PERMANENT_REDIRECT_CODES:
+                new_url = current_url
+        return new_url
+
+    def _request(self, url: str) -> requests.Response:
+        response = self._session.head(url, allow_redirects=False, timeout=self._timeout)
+        if response.status_code in HEAD_REFUSED_CODES:
+            response = self._session.get(url, allow_redirects=False,
+                                         timeout=self._timeout, stream=True)
+            response.close()
+        return response
+
+
+class AsyncUnshortener():  # pylint:disable=too-many-instance-attributes
+
+    """Resolves the url of the items on a pool of workers,
+    the resolved items are emitted one at a time from a dedicated thread.
+    Without workers, items are resolved and emitted by the caller
+    """
+
+    def __init__(self, unshortener: Unshortener,
+                 callback: Callable[[MyCollectItem], None],
+                 workers: int = 4, queue_size: int = 1000):
+        """AsyncUnshortener ctor
+
+        Args:
+            unshortener (Unshortener): resolves the urls
+            callback (Callable[[MyCollectItem], None]): receives the resolved items
+            workers (int, optional): number of concurrent resolutions. Defaults to 4.
+            queue_size (int, optional): maximum items waiting for a worker, and maximum
+                resolved items waiting for the callback, the workers wait above.
+                New items are dropped when the workers wait. Defaults to 1000.
+        """
+        self._unshortener = unshortener
+        self._callback = callback
+        self._logger = create_logger()
+        self._pending: queue.Queue = queue.Queue(maxsize=queue_size)
+        # bounded, a slow callback blocks the workers and the new items are dropped
+        self._resolved: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._counters = {"submitted": 0, "dropped": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._resolve, daemon=True)
+                         for _ in range(workers)]
+        self._emitter = threading.Thread(target=self._emit, daemon=True)
+        if self._workers:
+            self._emitter.start()
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, item: MyCollectItem) -> None:
+        """Resolves the url of the item and emits it, never blocks the caller
+        when there are workers
+
+        Args:
+            item (MyCollectItem): item, its url is resolved when it has one
+        """
+        if not self._workers:
+            self._resolve_item(item)
+            self._callback(item)
+            return
+        try:
+            self._pending.put_nowait(item)
+            self._count("submitted")
+        except queue.Full:
+            self._count("dropped")
+            self._logger.warning("unshortener queue full, item dropped", url=item.url)
+
+    def stats(self) -> Dict[str, int]:
+        """Gets the counters of this resolver
+
+        Returns:
+            Dict[str, int]: submitted, dropped items, resolution errors,
+                items waiting for a worker and resolved items waiting for the callback
+        """
+        with self._lock:
+            return dict(self._counters, pending=self._pending.qsize(),
+                        resolved=self._resolved.qsize())
+
+    def close(self) -> None:
+        """Resolves and emits the pending items, then stops the workers
+        """
+        for _ in self._workers:
+            self._pending.put(None)
+        for worker in self._workers:
+            worker.join()
+        if self._workers:
+            self._resolved.put(None)
+            self._emitter.join()
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _resolve_item(self, item: MyCollectItem):
+        if not item.url:
+            return
+        try:
+            item.url = self._unshortener.unshorten(item.url)  # type: ignore
+        except Exception as err:  # pylint:disable=broad-except
+            self._count("errors")
+            self._logger.error("unable to unshorten url", url=item.url, error=str(err))
+
+    def _resolve(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            self._resolve_item(item)
+            self._resolved.put(item)
+
+    def _emit(self):
+        while True:
+            item = self._resolved.get()
+            if item is None:
+                return
+            try:
+                self._callback(item)
+            except Exception as err:  # pylint:disable=broad-except
+                self._logger.exception(err)
+
+
+_DEFAULT_UNSHORTENER: Optional[Unshortener] = None
+
+
+def default_unshortener() -> Unshortener:
+    """Gets the unshortener shared by the components that are not configured
+
+    Returns:
+        Unshortener: the shared unshortener
+    """
+    global _DEFAULT_UNSHORTENER  # pylint:disable=global-statement
+    if _DEFAULT_UNSHORTENER is None:
+        _DEFAULT_UNSHORTENER = Unshortener()
+    return _DEFAULT_UNSHORTENER
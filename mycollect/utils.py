@@ -1,6 +1,5 @@
 """Utils for mycollect
 """
-import requests
 
 def get_class(kls):
     """
@@ -17,14 +16,11 @@ def get_class(kls):
 
 def unshorten_url(url):
     """
-        Unshorten the url
+        Unshorten the url with the shared unshortener
     """
-    response = requests.get(url, timeout=30)
-    new_url = url
-    for item in response.history:
-        if item.status_code == 301 and "location" in item.headers:
-            new_url = item.headers["location"]
-    return new_url
+    # mycollect.unshortener depends on this module through mycollect.cache
+    from mycollect.unshortener import default_unshortener  # pylint:disable=import-outside-toplevel
+    return default_unshortener().unshorten(url)
 
 def get_object_fqdn(obj):
     """Gets the fullname of the object
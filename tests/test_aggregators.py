@@ -14,3 +14,14 @@ def test_dummy_aggregator_1(load_mycollect_items):
     result = dummy.aggregates(load_mycollect_items)
     for item in load_mycollect_items:
         assert item.category in result
+
+def test_category_aggregator_canonical_urls():
+    items = []
+    for url in ["https://www.example.com/a/?utm_source=twitter", "https://example.com/a",
+                "https://example.com/a#comments", "https://example.com/b"]:
+        item = MyCollectItem("twitter", "drone", "text", url)
+        item.extra["article"] = {}
+        items.append(item)
+    result = CategoryAggregator().aggregates(items)
+    assert [(item["url"], item["count"]) for item in result["drone"]] == [
+        ("https://www.example.com/a/", 3), ("https://example.com/b", 1)]
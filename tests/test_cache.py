@@ -6,4 +6,92 @@ def test_dbm_cache(tmp_path):
     assert b is None
     my_cache.set_item("a", "b")
     b = my_cache.get_item("a")
-    assert b == "b"
\ No newline at end of file
+    assert b == "b"
+
+def test_lru_cache(tmp_path):
+    backend = cache.DbmCache("test", str(tmp_path))
+    backend.set_item("persisted", "value")
+    my_cache = cache.LruCache("test", max_items=2, ttl=3600, backend=backend)
+    assert my_cache.get_item("persisted") == "value"
+    assert my_cache.get_item("persisted") == "value"
+    assert my_cache.get_item("missing") is None
+    my_cache.set_item("a", "1")
+    my_cache.set_item("b", "2")
+    assert backend.get_item("a") == "1"
+    stats = my_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["backend_hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+    assert stats["items"] == 2
+    assert my_cache.get_item("persisted") == "value"
+
+
+def test_lru_cache_ttl():
+    my_cache = cache.LruCache("test", ttl=0)
+    my_cache.set_item("a", "1")
+    assert my_cache.get_item("a") is None
+    assert my_cache.stats()["expirations"] == 1
+
+
+def test_create_cache(tmp_path):
+    assert isinstance(cache.create_cache("test", working_folder=str(tmp_path)), cache.DbmCache)
+    my_cache = cache.create_cache("test", {
+        "type": "mycollect.cache.LruCache",
+        "args": {
+            "max_items": 10,
+            "backend": {
+                "type": "mycollect.cache.DbmCache",
+                "args": {"working_folder": str(tmp_path)}
+            }
+        }
+    })
+    assert isinstance(my_cache, cache.LruCache)
+    my_cache.set_item("a", "b")
+    assert cache.DbmCache("test", str(tmp_path)).get_item("a") == "b"
+
+
+def test_sqlite_cache(tmp_path):
+    my_cache = cache.SQLiteCache("test", str(tmp_path), max_size=100, compaction_interval=3600)
+    assert my_cache.get_item("a") is None
+    for i in range(10):
+        my_cache.set_item("key" + str(i), "v" * 20)
+    assert my_cache.get_item("key0") == "v" * 20
+    my_cache.compact()
+    assert my_cache.get_item("key0") == "v" * 20
+    assert my_cache.get_item("key1") is None
+    assert my_cache.get_item("key9") == "v" * 20
+    my_cache.close()
+    my_cache = cache.SQLiteCache("test", str(tmp_path), ttl=0, compaction_interval=3600)
+    assert my_cache.get_item("key9") is None
+    my_cache.compact()
+    my_cache.close()
+
+
+def test_failure_cache():
+    failures = cache.FailureCache(cache.LruCache("test"), base_delay=60, min_failures=2)
+    assert failures.get_failure("a") is None
+    failures.record_failure("a", "404")
+    assert failures.get_failure("a") is None
+    failure = failures.record_failure("a", "404")
+    assert failure["failures"] == 2
+    assert failures.get_failure("a")["reason"] == "404"
+    delay = failure["retry_at"]
+    assert failures.record_failure("a", "404")["retry_at"] > delay + 50
+    failures.record_success("a")
+    assert failures.get_failure("a") is None
+
+
+def test_content_addressed_cache(tmp_path):
+    backend = cache.DbmCache("test", str(tmp_path))
+    backend.set_item("legacy", "raw value")
+    my_cache = cache.ContentAddressedCache("test", backend)
+    value = "article text " * 1000
+    my_cache.set_item("a", value)
+    my_cache.set_item("b", value)
+    assert my_cache.get_item("a") == value
+    assert my_cache.get_item("b") == value
+    assert backend.get_item("a") == backend.get_item("b")
+    assert len(backend.get_item("a")) < 100
+    assert my_cache.get_item("legacy") == "raw value"
+    assert my_cache.get_item("missing") is None
@@ -0,0 +1,51 @@
+import pytest
+
+from mycollect.canonical import UrlCanonicalizer
+from mycollect.processors.canonical_url_processor import CanonicalUrlProcessor
+from mycollect.structures import MyCollectItem
+
+
+@pytest.mark.parametrize("url,canonical", [
+    ("https://WWW.Example.com:443/a/b/?utm_source=twitter&utm_medium=social&id=3#comments",
+     "https://www.example.com/a/b/?id=3"),
+    ("http://example.com:8080?b=2&a=1&fbclid=abc", "http://example.com:8080/?a=1&b=2"),
+    ("https://example.com/page?ref_src=twsrc%5Etfw", "https://example.com/page"),
+    ("ftp://example.com/file", "ftp://example.com/file"),
+    ("", ""),
+    (None, None)
+])
+def test_canonicalize(url, canonical):
+    assert UrlCanonicalizer().canonicalize(url) == canonical
+
+
+def test_key():
+    canonicalizer = UrlCanonicalizer()
+    urls = [
+        "https://www.example.com/article/",
+        "https://example.com/article",
+        "https://EXAMPLE.com/article?utm_campaign=x#top",
+    ]
+    assert {canonicalizer.key(url) for url in urls} == {"https://example.com/article"}
+    assert canonicalizer.key("https://example.com/") == "https://example.com/"
+
+
+def test_domain_rules():
+    canonicalizer = UrlCanonicalizer(domain_rules={
+        "nytimes.com": ["smid", "smtyp"],
+        "medium.com": ["*"]
+    })
+    assert canonicalizer.canonicalize("https://www.nytimes.com/a.html?smid=tw&page=2") == \
+        "https://www.nytimes.com/a.html?page=2"
+    assert canonicalizer.canonicalize("https://blog.medium.com/post?source=rss&sk=1") == \
+        "https://blog.medium.com/post"
+    assert canonicalizer.canonicalize("https://example.com/a.html?smid=tw") == \
+        "https://example.com/a.html?smid=tw"
+
+
+def test_canonical_url_processor():
+    processor = CanonicalUrlProcessor()
+    item = processor.update_item(MyCollectItem(url="https://example.com/a?utm_source=x"))
+    assert item.url == "https://example.com/a"
+    assert item.extra["origin_url"] == "https://example.com/a?utm_source=x"
+    item = processor.update_item(MyCollectItem(url="https://example.com/a"))
+    assert "origin_url" not in item.extra
@@ -0,0 +1,74 @@
+import pytest
+
+from mycollect.processors.dedup_processor import BloomFilter, DedupProcessor, RotatingBloomFilter
+from mycollect.structures import MyCollectItem
+
+
+def test_bloom_filter():
+    bloom_filter = BloomFilter(1000, 0.01)
+    for index in range(1000):
+        bloom_filter.add(f"key {index}")
+    assert all(f"key {index}" in bloom_filter for index in range(1000))
+    false_positives = sum(f"other {index}" in bloom_filter for index in range(10000))
+    assert false_positives < 300
+    assert bloom_filter.size_bytes < 1300
+
+
+def test_rotating_bloom_filter():
+    bloom_filter = RotatingBloomFilter(window=40, capacity=100, error_rate=0.01, slices=4)
+    assert not bloom_filter.check_and_add("first", now=0)
+    assert bloom_filter.check_and_add("first", now=5)
+    assert not bloom_filter.check_and_add("second", now=25)
+    assert bloom_filter.check_and_add("first", now=35)
+    for now in range(40, 80, 10):
+        bloom_filter.check_and_add(f"key {now}", now=now)
+    assert not bloom_filter.check_and_add("first", now=80)
+    assert bloom_filter.rotations == 7
+    assert bloom_filter.early_rotations == 0
+
+
+def test_rotating_bloom_filter_capacity():
+    bloom_filter = RotatingBloomFilter(window=3600, capacity=40, error_rate=0.01, slices=4)
+    for index in range(100):
+        bloom_filter.check_and_add(f"key {index}", now=0)
+    assert bloom_filter.rotations == 10
+    assert bloom_filter.early_rotations == 9
+    assert not bloom_filter.check_and_add("key 0", now=0)
+    assert bloom_filter.check_and_add("key 99", now=0)
+
+
+def test_dedup_urls():
+    processor = DedupProcessor(action="drop")
+    urls = ["https://www.example.com/article?utm_source=twitter",
+            "https://example.com/article/",
+            "https://example.com/other"]
+    items = [MyCollectItem(category="news", url=url) for url in urls]
+    items.append(MyCollectItem(category="tech", url=urls[0]))
+    items.append(MyCollectItem(category="news", url=""))
+    assert [item.url for item in processor.update_items(items)] == [urls[0], urls[2], urls[0], ""]
+    stats = processor.stats()
+    assert stats["checked"] == 4
+    assert stats["duplicates"] == 1
+    assert stats["without_key"] == 1
+
+
+def test_dedup_tweets():
+    processor = DedupProcessor(key="tweet")
+    tweet = {"id_str": "1", "text": "shared"}
+    retweet = {"id_str": "2", "retweeted_status": tweet}
+    api_retweet = {"data": {"id": "3", "referenced_tweets": [{"type": "retweeted", "id": "1"}]}}
+    other = {"data": {"id": "4"}}
+    items = []
+    for data in [tweet, retweet, api_retweet, other]:
+        item = MyCollectItem(url="https://example.com")
+        item.extra["tweet"] = data
+        items.append(processor.update_item(item))
+    assert [item.extra.get("duplicate", False) for item in items] == [False, True, True, False]
+    assert processor.stats()["duplicates"] == 2
+
+
+def test_dedup_arguments():
+    with pytest.raises(ValueError):
+        DedupProcessor(key="text")
+    with pytest.raises(ValueError):
+        DedupProcessor(action="delete")
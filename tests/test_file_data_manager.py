@@ -2,7 +2,9 @@ import os
 import datetime
 import pytest
 import json
+import time
 
+from mycollect.storage import ItemFilter
 from mycollect.storage.file_storage import FileStorage
 from mycollect.structures import MyCollectItem
 
@@ -25,6 +27,16 @@ def test_store_data(tmp_path):
     assert value["timestamp"] <= round(datetime.datetime.now().timestamp())
     assert value["data"]["category"] == "bar"
 
+def test_store_items(tmp_path):
+    fdm = FileStorage(str(tmp_path))
+    fdm.store_items([MyCollectItem("foo" if i % 2 else "bar", str(i), "hello", "world")
+                     for i in range(10)] + [MyCollectItem(None, "none", "hello", "world")])
+    timestamp = round((datetime.datetime.now() - datetime.timedelta(minutes=1)).timestamp())
+    items = list(fdm.fetch_items(timestamp))
+    assert sorted(int(item.category) for item in items) == list(range(10))
+    assert sorted(os.listdir(str(tmp_path))) == ["bar", "foo"]
+
+
 def test_read_data(tmp_path):
     d = tmp_path / "test"
     d.mkdir()
@@ -37,4 +49,211 @@ def test_read_data(tmp_path):
     for item in fdm.fetch_items(timestamp):
         assert str(i) == item.category
         i += 1
-    assert i == 987
\ No newline at end of file
+    assert i == 987
+
+def test_buffered_store_data(tmp_path):
+    d = tmp_path / "test"
+    d.mkdir()
+    fdm = FileStorage(d, buffered=True, flush_size=10, flush_interval=60)
+    timestamp = round(datetime.datetime.now().timestamp())
+    for i in range(25):
+        fdm.store_item(MyCollectItem("foo", str(i), "cat", "url"))
+    items = list(fdm.fetch_items(timestamp))
+    assert [item.category for item in items] == [str(i) for i in range(25)]
+    fdm.store_item(MyCollectItem("foo", "last", "cat", "url"))
+    fdm.close()
+    dt = datetime.datetime.now()
+    filename = "{}_{:02d}_{:02d}.jsonl".format(dt.year, dt.month, dt.day)
+    lines = list(open(os.path.join(d, "foo", filename)))
+    assert 26 == len(lines)
+    assert json.loads(lines[-1])["data"]["category"] == "last"
+
+
+def test_read_data_with_index(tmp_path):
+    d = tmp_path / "test"
+    d.mkdir()
+    fdm = FileStorage(d, index_bucket=60)
+    now = round(datetime.datetime.now().timestamp())
+    dt = datetime.datetime.fromtimestamp(now)
+    os.makedirs(os.path.join(d, "foo"))
+    file_path = os.path.join(d, "foo", dt.strftime("%Y_%m_%d.jsonl"))
+    day_start = round(datetime.datetime(dt.year, dt.month, dt.day).timestamp())
+    with open(file_path, "w") as output_file:
+        for i in range(0, now - day_start + 1, 30):
+            item = {"timestamp": day_start + i,
+                    "data": MyCollectItem("foo", str(day_start + i), "t", "u").to_dict()}
+            output_file.write(json.dumps(item) + "\n")
+    timestamp = now - 300
+    expected = [str(day_start + i) for i in range(0, now - day_start + 1, 30)
+                if day_start + i >= timestamp]
+    assert [item.category for item in fdm.fetch_items(timestamp)] == expected
+    assert os.path.exists(file_path + ".idx")
+    index = json.load(open(file_path + ".idx"))
+    assert index["size"] == os.path.getsize(file_path)
+    fdm.store_item(MyCollectItem("foo", "appended", "t", "u"))
+    assert [item.category for item in fdm.fetch_items(timestamp)][-1] == "appended"
+
+
+def test_sealed_segments(tmp_path):
+    d = tmp_path / "test"
+    d.mkdir()
+    os.makedirs(os.path.join(d, "foo"))
+    yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+    day_start = round(datetime.datetime(
+        yesterday.year, yesterday.month, yesterday.day).timestamp())
+    file_path = os.path.join(d, "foo", yesterday.strftime("%Y_%m_%d.jsonl"))
+    timestamps = list(range(day_start, day_start + 86400, 60))
+    with open(file_path, "w") as output_file:
+        for timestamp in timestamps:
+            item = {"timestamp": timestamp,
+                    "data": MyCollectItem("foo", str(timestamp), "t", "u").to_dict()}
+            output_file.write(json.dumps(item) + "\n")
+    fdm = FileStorage(d, compression="gzip", frame_size=4096)
+    assert not os.path.exists(file_path)
+    assert os.path.exists(file_path + ".gz")
+    frames = json.load(open(file_path + ".gz.idx"))["frames"]
+    assert len(frames) > 1
+    start = timestamps[len(timestamps) // 2]
+    fetched = [item.category for item in fdm.fetch_items(start)]
+    assert fetched == [str(t) for t in timestamps if t >= start]
+    assert len(list(fdm.fetch_items(day_start))) == len(timestamps)
+    with pytest.raises(ValueError):
+        FileStorage(d, compression="foo")
+
+
+def test_seal_late_lines(tmp_path):
+    os.makedirs(os.path.join(tmp_path, "foo"))
+    yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+    day_start = round(datetime.datetime(
+        yesterday.year, yesterday.month, yesterday.day).timestamp())
+    file_path = os.path.join(tmp_path, "foo", yesterday.strftime("%Y_%m_%d.jsonl"))
+
+    def write_lines(categories):
+        with open(file_path, "a") as output_file:
+            for category in categories:
+                item = {"timestamp": day_start + 60,
+                        "data": MyCollectItem("foo", category, "t", "u").to_dict()}
+                output_file.write(json.dumps(item) + "\n")
+
+    write_lines(["sealed"])
+    # a file next to the provider folders is ignored
+    open(os.path.join(tmp_path, "mycollect.db"), "wb").write(b"database")
+    fdm = FileStorage(str(tmp_path), compression="gzip")
+    write_lines(["late"])
+    fdm.seal()
+    assert not os.path.exists(file_path)
+    # a segment of another codec is ignored, a day has a single segment
+    open(file_path + ".zst", "wb").write(b"not a zstd segment")
+    assert [item.category for item in fdm.fetch_items(day_start)] == ["sealed", "late"]
+
+
+def write_yesterday(folder, categories):
+    os.makedirs(os.path.join(folder, "foo"), exist_ok=True)
+    yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+    day_start = round(datetime.datetime(
+        yesterday.year, yesterday.month, yesterday.day).timestamp())
+    file_path = os.path.join(folder, "foo", yesterday.strftime("%Y_%m_%d.jsonl"))
+    with open(file_path, "a") as output_file:
+        for category in categories:
+            item = {"timestamp": day_start + 60,
+                    "data": MyCollectItem("foo", category, "t", "u").to_dict()}
+            output_file.write(json.dumps(item) + "\n")
+    return file_path, day_start
+
+
+@pytest.mark.parametrize("failing", ["_end_seal", "_iter_frames"])
+def test_seal_interrupted(tmp_path, failing):
+    fdm = FileStorage(str(tmp_path), compression="gzip")
+    file_path, day_start = write_yesterday(tmp_path, ["first"])
+    fdm.seal()
+    file_path, day_start = write_yesterday(tmp_path, ["second"])
+
+    def interrupt(*args):
+        raise OSError("interrupted")
+
+    # the seal stops before or after the segment is replaced
+    setattr(fdm, failing, interrupt)
+    fdm.seal()
+    assert os.path.exists(file_path + ".sealing")
+    # the lines being sealed are still read
+    assert "second" in [item.category for item in fdm.fetch_items(day_start)]
+    delattr(fdm, failing)
+    fdm.seal()
+    assert not os.path.exists(file_path + ".sealing")
+    assert not os.path.exists(file_path + ".gz.tmp")
+    assert not os.path.exists(file_path + ".gz.tmp.idx")
+    assert [item.category for item in fdm.fetch_items(day_start)] == ["first", "second"]
+
+
+def test_close_waits_for_seal(tmp_path):
+    fdm = FileStorage(str(tmp_path), compression="gzip")
+    file_path, _ = write_yesterday(tmp_path, ["first"])
+    fdm._current_day = datetime.date.today() - datetime.timedelta(days=1)
+    fdm.store_item(MyCollectItem("foo", "today", "t", "u"))
+    fdm.close()
+    assert not os.path.exists(file_path)
+    assert os.path.exists(file_path + ".gz")
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_read_data_parallel(tmp_path, ordered):
+    d = tmp_path / "test"
+    d.mkdir()
+    fdm = FileStorage(d, fetch_workers=2, fetch_ordered=ordered, fetch_chunk=7)
+    timestamp = round(datetime.datetime.now().timestamp())
+    for provider in ["foo", "bar", "baz"]:
+        for i in range(100):
+            fdm.store_item(MyCollectItem(provider, str(i), "cat", "url"))
+    items = list(fdm.fetch_items(timestamp))
+    assert len(items) == 300
+    if ordered:
+        sequential = FileStorage(d)
+        assert [(item.provider, item.category) for item in items] == \
+            [(item.provider, item.category) for item in sequential.fetch_items(timestamp)]
+    first_items = fdm.fetch_items(timestamp)
+    assert next(first_items)
+    first_items.close()
+
+
+class CountingFileStorage(FileStorage):
+
+    read_files = 0
+
+    def _read_file(self, file_path, *args, **kwargs):
+        CountingFileStorage.read_files += 1
+        yield from super()._read_file(file_path, *args, **kwargs)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_read_data_parallel_bounded(tmp_path, ordered):
+    fdm = CountingFileStorage(str(tmp_path), fetch_workers=2, fetch_ordered=ordered)
+    timestamp = round(datetime.datetime.now().timestamp())
+    for provider in range(20):
+        fdm.store_item(MyCollectItem(f"provider{provider}", "cat", "text", "url"))
+    CountingFileStorage.read_files = 0
+    items = fdm.fetch_items(timestamp)
+    assert next(items)
+    time.sleep(0.2)
+    if ordered:
+        # the first file and the 2 * fetch_workers files read ahead
+        assert CountingFileStorage.read_files <= 5
+    items.close()
+    assert CountingFileStorage.read_files < 20
+
+
+def test_read_data_pushdown(tmp_path):
+    d = tmp_path / "test"
+    d.mkdir()
+    fdm = FileStorage(d)
+    timestamp = round(datetime.datetime.now().timestamp())
+    for i in range(20):
+        item = MyCollectItem("foo" if i % 2 else "bar", "cat" + str(i % 3), "text", "url")
+        item.extra["tweet"] = {"id": i}
+        if i % 4 == 0:
+            item.extra["article"] = {"title": str(i)}
+        fdm.store_item(item)
+    item_filter = ItemFilter(categories=["cat0", "cat1"], providers=["bar"], has_article=True)
+    items = list(fdm.fetch_items(timestamp, item_filter=item_filter, fields=["article"]))
+    assert [item.extra for item in items] == \
+        [{"article": {"title": str(i)}} for i in (0, 4, 12, 16)]
+    assert not list(fdm.fetch_items(timestamp, end_timestamp=timestamp - 1))
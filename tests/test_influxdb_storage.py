@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from mycollect.storage.influxdb_storage import InfluxDBStorage
+from mycollect.structures import MyCollectItem
+
+
+class FakeInfluxDB(BaseHTTPRequestHandler):
+
+    lines = []
+    write_status = 204
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/write"):
+            self.send_response(FakeInfluxDB.write_status)
+            self.end_headers()
+            if FakeInfluxDB.write_status == 204:
+                FakeInfluxDB.lines.extend(body.decode().splitlines())
+            return
+        payload = json.dumps({"results": [{"statement_id": 0}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def influxdb_server():
+    FakeInfluxDB.lines = []
+    FakeInfluxDB.write_status = 204
+    server = HTTPServer(("127.0.0.1", 0), FakeInfluxDB)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def create_storage(server, **kwargs):
+    return InfluxDBStorage(host="127.0.0.1", port=server.server_address[1],
+                           username="", password="", database="mycollect", **kwargs)
+
+
+def test_batched_writes(influxdb_server):
+    storage = create_storage(influxdb_server, batch_size=10, flush_interval=60)
+    for i in range(25):
+        storage.store_item(MyCollectItem("twitter", "foo", "text " + str(i), "url"))
+    deadline = time.time() + 5
+    while len(FakeInfluxDB.lines) < 20 and time.time() < deadline:
+        time.sleep(0.05)
+    assert len(FakeInfluxDB.lines) == 20
+    storage.close()
+    assert len(FakeInfluxDB.lines) == 25
+    assert storage.stats()["written"] == 25
+
+
+def test_retry_and_overflow(influxdb_server):
+    FakeInfluxDB.write_status = 500
+    storage = create_storage(influxdb_server, batch_size=5, flush_interval=0.1,
+                             max_buffer=10, max_backoff=0.2)
+    for i in range(15):
+        storage.store_item(MyCollectItem("twitter", "foo", "text " + str(i), "url"))
+    time.sleep(0.5)
+    stats = storage.stats()
+    assert stats["dropped"] == 5
+    assert stats["retries"] > 0
+    assert stats["buffered"] == 10
+    FakeInfluxDB.write_status = 204
+    storage.close()
+    assert len(FakeInfluxDB.lines) == 10
+
+
+def test_refused_points(influxdb_server):
+    FakeInfluxDB.write_status = 400
+    storage = create_storage(influxdb_server, batch_size=5, flush_interval=0.1)
+    for i in range(5):
+        storage.store_item(MyCollectItem("twitter", "foo", "text " + str(i), "url"))
+    time.sleep(0.3)
+    stats = storage.stats()
+    assert stats["dropped"] == 5
+    assert stats["retries"] == 0
+    assert stats["buffered"] == 0
+    FakeInfluxDB.write_status = 204
+    storage.store_item(MyCollectItem("twitter", "foo", "text", "url"))
+    storage.close()
+    assert len(FakeInfluxDB.lines) == 1
+
+
+def test_retry_too_many_requests(influxdb_server):
+    FakeInfluxDB.write_status = 429
+    storage = create_storage(influxdb_server, batch_size=5, flush_interval=0.1, max_backoff=0.2)
+    for i in range(5):
+        storage.store_item(MyCollectItem("twitter", "foo", "text " + str(i), "url"))
+    time.sleep(0.3)
+    assert storage.stats()["retries"] > 0
+    FakeInfluxDB.write_status = 204
+    storage.close()
+    assert len(FakeInfluxDB.lines) == 5
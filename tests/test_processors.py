@@ -1,5 +1,11 @@
+import threading
+import time
+
+import pytest
+
 from mycollect.processors.exit_processor import ExitProcessor
-from mycollect.processors import PipelineProcessor
+from mycollect.processors import MicroBatcher, PipelineProcessor, Processor
+from mycollect.processors.staged_pipeline_processor import StagedPipelineProcessor
 from mycollect.storage import Storage
 from mycollect.structures import MyCollectItem
 
@@ -30,3 +36,323 @@ def test_pipeline_processor():
     mci = MyCollectItem("dum", "foo", "bar")
     pipeline.update_item(mci)
     assert mci in storage.fetch_items(None)
+
+class SlowStorage(DummyStorage):
+
+    def __init__(self, delay):
+        super().__init__()
+        self._delay = delay
+
+    def store_item(self, item):
+        time.sleep(self._delay)
+        super().store_item(item)
+
+
+def test_exit_processor_concurrent():
+    fast = DummyStorage()
+    slow = SlowStorage(0.01)
+    processor = ExitProcessor([fast, slow], concurrent=True, queue_size=5)
+    items = [MyCollectItem("dum", str(i), "bar") for i in range(20)]
+    for item in items:
+        processor.update_item(item)
+    processor.close()
+    assert fast.fetch_items(None) == items
+    assert slow.fetch_items(None) == items
+    stats = processor.stats()
+    assert len(stats) == 2
+    for storage_stats in stats.values():
+        assert storage_stats["written"] == 20
+        assert storage_stats["queue_depth"] == 0
+
+
+class FailingStorage(DummyStorage):
+
+    def store_item(self, item):
+        raise IOError("storage unavailable")
+
+
+def test_exit_processor_errors():
+    processor = ExitProcessor([FailingStorage()], concurrent=True)
+    for i in range(5):
+        processor.update_item(MyCollectItem("dum", str(i), "bar"))
+    processor.close()
+    stats = list(processor.stats().values())[0]
+    assert stats["items"] == 5
+    assert stats["errors"] == 5
+    assert stats["written"] == 0
+
+
+def test_exit_processor_drop_oldest():
+    storage = SlowStorage(0.05)
+    processor = ExitProcessor([storage], concurrent=True, queue_size=2,
+                              backpressure="drop_oldest")
+    for i in range(10):
+        processor.update_item(MyCollectItem("dum", str(i), "bar"))
+    processor.close()
+    stats = list(processor.stats().values())[0]
+    assert stats["dropped"] > 0
+    assert stats["written"] + stats["dropped"] == 10
+    assert storage.fetch_items(None)[-1].category == "9"
+
+
+def test_exit_processor_spill(tmp_path):
+    storage = SlowStorage(0.02)
+    processor = ExitProcessor([storage], concurrent=True, queue_size=2,
+                              backpressure="spill", spill_folder=str(tmp_path))
+    for i in range(10):
+        processor.update_item(MyCollectItem("dum", str(i), "bar"))
+    processor.close()
+    stats = list(processor.stats().values())[0]
+    assert stats["spilled"] > 0
+    assert stats["written"] == 10
+    assert sorted(int(item.category) for item in storage.fetch_items(None)) == list(range(10))
+    with pytest.raises(ValueError):
+        ExitProcessor([storage], concurrent=True, backpressure="spill")
+
+
+class SlowProcessor(Processor):
+
+    def __init__(self, delay):
+        self._delay = delay
+
+    def update_item(self, item):
+        time.sleep(self._delay)
+        item.extra.setdefault("stages", []).append(self._delay)
+        return item
+
+
+def test_staged_pipeline():
+    storage = DummyStorage()
+    pipeline = StagedPipelineProcessor(queue_size=2)
+    pipeline.append_processor(SlowProcessor(0.001), "first")
+    pipeline.append_processor(SlowProcessor(0.002), "second")
+    pipeline.append_processor(ExitProcessor(storage), "exit")
+    items = [MyCollectItem("dum", str(i), "bar") for i in range(20)]
+    for item in items:
+        assert pipeline.update_item(item) is None
+    pipeline.close()
+    assert storage.fetch_items(None) == items
+    assert all(item.extra["stages"] == [0.001, 0.002] for item in items)
+    stats = pipeline.stats()
+    assert list(stats) == ["first", "second", "exit"]
+    assert stats["second"]["items"] == 20
+    assert stats["exit"]["queue_depth"] == 0
+
+
+def test_staged_pipeline_backpressure():
+    storage = DummyStorage()
+    pipeline = StagedPipelineProcessor(queue_size=2, stages={
+        "slow": {"backpressure": "shed", "queue_size": 1},
+        "exit": {"backpressure": "drop", "queue_size": 1}
+    })
+    storage = SlowStorage(0.05)
+    pipeline.append_processor(SlowProcessor(0.02), "slow")
+    pipeline.append_processor(ExitProcessor(storage), "exit")
+    for i in range(10):
+        item = MyCollectItem("dum", str(i), "bar")
+        item.low_priority = i % 2 == 1
+        pipeline.update_item(item)
+    pipeline.close()
+    stats = pipeline.stats()
+    assert stats["slow"]["shed"] > 0
+    assert stats["slow"]["items"] + stats["slow"]["shed"] == 10
+    assert stats["exit"]["dropped"] > 0
+    assert not any("low_priority" in item.extra for item in storage.fetch_items(None))
+    with pytest.raises(ValueError):
+        StagedPipelineProcessor(backpressure="unknown").append_processor(SlowProcessor(0))
+
+
+class BatchStorage(DummyStorage):
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def store_items(self, items):
+        self.batches.append(len(items))
+        self._items.extend(items)
+
+
+def test_pipeline_batches():
+    storage = BatchStorage()
+    pipeline = PipelineProcessor(batch_size=10, batch_latency=0.05)
+    pipeline.append_processor(SlowProcessor(0))
+    pipeline.append_processor(ExitProcessor(storage))
+    items = [MyCollectItem("dum", str(i), "bar") for i in range(25)]
+    for item in items:
+        assert pipeline.update_item(item) is None
+    time.sleep(0.2)
+    assert storage.batches == [10, 10, 5]
+    pipeline.update_item(MyCollectItem("dum", "last", "bar"))
+    pipeline.close()
+    assert storage.batches == [10, 10, 5, 1]
+    assert storage.fetch_items(None)[:25] == items
+
+
+class PickyProcessor(Processor):
+
+    def update_item(self, item):
+        if item.category == "bad":
+            raise ValueError("bad item")
+        if item.category == "drop":
+            return None
+        item.extra["picky"] = True
+        return item
+
+
+def test_pipeline_batch_with_error():
+    pipeline = PipelineProcessor()
+    pipeline.append_processor(PickyProcessor())
+    items = [MyCollectItem("dum", category, "bar") for category in ["drop", "bad", "ok"]]
+    new_items = pipeline.update_items(items)
+    assert [item.category for item in new_items] == ["bad", "ok"]
+    assert new_items[1].extra["picky"]
+
+
+class AsyncProcessor(Processor):
+
+    def __init__(self):
+        self._forward = None
+        self._items = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def set_forward(self, forward):
+        self._forward = forward
+
+    def update_item(self, item):
+        with self._condition:
+            self._items.append(item)
+            self._condition.notify()
+        return None
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._items and not self._closed:
+                    self._condition.wait()
+                if not self._items:
+                    return
+                item = self._items.pop(0)
+            self._forward(item)
+
+
+def test_pipeline_batches_after_async_processor():
+    storage = BatchStorage()
+    pipeline = PipelineProcessor(batch_size=10, batch_latency=0.05)
+    pipeline.append_processor(AsyncProcessor())
+    pipeline.append_processor(ExitProcessor(storage))
+    items = [MyCollectItem("dum", str(i), "bar") for i in range(25)]
+    for item in items:
+        pipeline.update_item(item)
+    pipeline.close()
+    assert sum(storage.batches) == 25
+    assert max(storage.batches) > 1
+    assert storage.fetch_items(None) == items
+
+
+def test_micro_batcher_latency():
+    batches = []
+    batcher = MicroBatcher(batches.append, batch_size=100, max_latency=0.05)
+    batcher.put(MyCollectItem("dum", "foo", "bar"))
+    time.sleep(0.2)
+    assert len(batches) == 1
+    batcher.close()
+
+
+def test_staged_pipeline_batches():
+    storage = BatchStorage()
+    pipeline = StagedPipelineProcessor(batch_size=50)
+    pipeline.append_processor(SlowProcessor(0.01), "slow")
+    pipeline.append_processor(ExitProcessor(storage), "exit")
+    for i in range(20):
+        pipeline.update_item(MyCollectItem("dum", str(i), "bar"))
+    pipeline.close()
+    assert sum(storage.batches) == 20
+    assert len(storage.batches) < 20
+
+
+def test_exit_processor_worker_batches():
+    storage = BatchStorage()
+    processor = ExitProcessor([storage], concurrent=True, batch_size=5)
+    processor.update_items([MyCollectItem("dum", str(i), "bar") for i in range(12)])
+    processor.close()
+    assert sum(storage.batches) == 12
+    assert max(storage.batches) <= 5
+
+
+class FailingProcessor(Processor):
+
+    def update_item(self, item):
+        if item.category == "fail":
+            raise ValueError("failure")
+        return None if item.category == "drop" else item
+
+
+def test_pipeline_stats():
+    storage = DummyStorage()
+    pipeline = PipelineProcessor()
+    pipeline.append_processor(FailingProcessor(), "failing")
+    pipeline.append_processor(ExitProcessor(storage))
+    for category in ["keep", "drop", "fail", "keep"]:
+        pipeline.update_item(MyCollectItem("dum", category, "bar"))
+    stats = pipeline.stats()
+    assert list(stats) == ["failing", "mycollect.processors.exit_processor.ExitProcessor"]
+    assert stats["failing"]["items"] == 4
+    assert stats["failing"]["filtered"] == 1
+    assert stats["failing"]["errors"] == 1
+    assert stats["failing"]["p99_ms"] >= stats["failing"]["p50_ms"]
+    exit_stats = stats["mycollect.processors.exit_processor.ExitProcessor"]
+    assert exit_stats["items"] == 3
+    storage_stats = exit_stats["processor"]["tests.test_processors.DummyStorage"]
+    assert storage_stats["items"] == 3
+
+
+def test_pipeline_batch_stats():
+    storage = DummyStorage()
+    pipeline = PipelineProcessor(batch_size=4, batch_latency=0.05)
+    pipeline.append_processor(FailingProcessor(), "failing")
+    pipeline.append_processor(ExitProcessor(storage))
+    for category in ["keep", "drop", "fail", "keep"]:
+        pipeline.update_item(MyCollectItem("dum", category, "bar"))
+    pipeline.close()
+    stats = pipeline.stats()
+    assert stats["failing"]["items"] == 4
+    assert stats["failing"]["filtered"] == 1
+    assert stats["failing"]["errors"] == 1
+    assert len(storage.fetch_items(None)) == 3
+
+
+def test_staged_pipeline_stats():
+    storage = DummyStorage()
+    pipeline = StagedPipelineProcessor(batch_size=4)
+    pipeline.append_processor(FailingProcessor(), "failing")
+    pipeline.append_processor(ExitProcessor(storage), "exit")
+    for category in ["keep", "drop", "fail", "keep"]:
+        pipeline.update_item(MyCollectItem("dum", category, "bar"))
+    pipeline.close()
+    stats = pipeline.stats()
+    assert stats["failing"]["items"] == 4
+    assert stats["failing"]["filtered"] == 1
+    assert stats["failing"]["errors"] == 1
+    assert stats["exit"]["items"] == 3
+
+
+def test_staged_pipeline_update_items():
+    storage = DummyStorage()
+    pipeline = StagedPipelineProcessor()
+    pipeline.append_processor(SlowProcessor(0), "slow")
+    pipeline.append_processor(ExitProcessor(storage), "exit")
+    items = [MyCollectItem("dum", str(i), "bar") for i in range(5)]
+    assert pipeline.update_items(items) == []
+    pipeline.close()
+    assert storage.fetch_items(None) == items
+    assert pipeline.stats()["slow"]["items"] == 5
@@ -0,0 +1,79 @@
+import datetime
+import sqlite3
+
+import pytest
+
+from mycollect.storage import ItemFilter
+from mycollect.storage.sqlite_storage import SQLiteStorage
+from mycollect.structures import MyCollectItem
+
+
+def test_store_and_fetch(tmp_path):
+    path = str(tmp_path / "storage" / "mycollect.db")
+    storage = SQLiteStorage(path, batch_size=10, flush_interval=60)
+    timestamp = round(datetime.datetime.now().timestamp())
+    for i in range(25):
+        item = MyCollectItem("foo", str(i), "hello", "https://example.com/" + str(i))
+        if i % 2:
+            item.extra["article"] = {"title": "title " + str(i)}
+        storage.store_item(item)
+    items = list(storage.fetch_items(timestamp))
+    assert [item.category for item in items] == [str(i) for i in range(25)]
+    assert items[1].extra["article"]["title"] == "title 1"
+    assert "article" not in items[0].extra
+    assert not list(storage.fetch_items(timestamp + 3600))
+    storage.store_item(MyCollectItem("foo", "last", "hello", "url"))
+    storage.close()
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 26
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert connection.execute(
+        "SELECT COUNT(*) FROM items WHERE has_article = 1").fetchone()[0] == 12
+
+
+def test_fetch_pushdown(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "mycollect.db"))
+    timestamp = round(datetime.datetime.now().timestamp())
+    for i in range(20):
+        item = MyCollectItem("foo" if i % 2 else "bar", "cat" + str(i % 3), "text", "url")
+        item.extra["tweet"] = {"id": i}
+        item.extra["score"] = i
+        if i % 4 == 0:
+            item.extra["article"] = {"title": str(i)}
+        storage.store_item(item)
+    item_filter = ItemFilter(categories=["cat0", "cat1"], providers=["bar"], has_article=True)
+    items = list(storage.fetch_items(timestamp, item_filter=item_filter,
+                                     fields=["article", "score", "missing"]))
+    assert [item.extra for item in items] == \
+        [{"article": {"title": str(i)}, "score": i} for i in (0, 4, 12, 16)]
+    assert not list(storage.fetch_items(timestamp, end_timestamp=timestamp - 1))
+    storage.close()
+
+
+def test_store_items(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "mycollect.db"), batch_size=10)
+    timestamp = round(datetime.datetime.now().timestamp())
+    storage.store_items([MyCollectItem("foo", str(i), "hello", "url") for i in range(15)])
+    assert [item.category for item in storage.fetch_items(timestamp)] == \
+        [str(i) for i in range(15)]
+    storage.close()
+
+
+def test_failed_write_is_retried(tmp_path):
+    path = str(tmp_path / "mycollect.db")
+    storage = SQLiteStorage(path, flush_interval=60, max_pending=15, timeout=0.05)
+    timestamp = round(datetime.datetime.now().timestamp())
+    lock = sqlite3.connect(path)
+    lock.execute("BEGIN EXCLUSIVE")
+    storage.store_items([MyCollectItem("foo", str(i), "hello", "url") for i in range(10)])
+    with pytest.raises(sqlite3.OperationalError):
+        storage.flush()
+    storage.store_items([MyCollectItem("foo", str(i), "hello", "url") for i in range(10, 20)])
+    with pytest.raises(sqlite3.OperationalError):
+        storage.flush()
+    lock.rollback()
+    lock.close()
+    # the 5 oldest items are dropped above max_pending
+    assert [item.category for item in storage.fetch_items(timestamp)] == \
+        [str(i) for i in range(5, 20)]
+    storage.close()
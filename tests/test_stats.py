@@ -0,0 +1,29 @@
+import pytest
+
+from mycollect.stats import LatencyHistogram, StageStats
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0
+    for value in range(1, 1001):
+        histogram.record(value / 1000)
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.12)
+    assert histogram.percentile(95) == pytest.approx(0.95, rel=0.12)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.12)
+    assert histogram.max == 1
+    histogram.record(5000)
+    assert histogram.percentile(100) == 5000
+
+
+def test_stage_stats():
+    stats = StageStats()
+    stats.record(0.002)
+    stats.record(0.004, items=10, filtered=3)
+    stats.record(0.1, errors=1)
+    snapshot = stats.snapshot()
+    assert snapshot["items"] == 12
+    assert snapshot["filtered"] == 3
+    assert snapshot["errors"] == 1
+    assert snapshot["max_ms"] == 100
+    assert snapshot["p50_ms"] == pytest.approx(4, rel=0.12)
@@ -0,0 +1,46 @@
+import datetime
+
+from mycollect.storage import ItemFilter
+from mycollect.storage.tiered_storage import TieredStorage
+from mycollect.structures import MyCollectItem
+
+
+def create_storage(tmp_path, **kwargs):
+    return TieredStorage({
+        "type": "mycollect.storage.file_storage.FileStorage",
+        "args": {"folder": str(tmp_path)}
+    }, **kwargs)
+
+
+def test_fetch_from_memory(tmp_path):
+    storage = create_storage(tmp_path)
+    timestamp = round(datetime.datetime.now().timestamp())
+    for i in range(10):
+        item = MyCollectItem("foo", str(i), "text", "url")
+        if i % 2:
+            item.extra["article"] = {"title": str(i)}
+        item.extra["tweet"] = {"id": i}
+        storage.store_item(item)
+    items = list(storage.fetch_items(timestamp))
+    assert [item.category for item in items] == [str(i) for i in range(10)]
+    items = list(storage.fetch_items(timestamp, item_filter=ItemFilter(has_article=True),
+                                     fields=["article"]))
+    assert [item.extra for item in items] == [{"article": {"title": str(i)}} for i in (1, 3, 5, 7, 9)]
+    assert storage.stats()["memory_fetches"] == 2
+    items = list(storage.fetch_items(timestamp - 3600))
+    assert len(items) == 10
+    assert storage.stats()["storage_fetches"] == 1
+    storage.close()
+
+
+def test_memory_bound(tmp_path):
+    storage = create_storage(tmp_path, max_bytes=1000)
+    timestamp = round(datetime.datetime.now().timestamp())
+    for i in range(50):
+        storage.store_item(MyCollectItem("foo", str(i), "text", "url"))
+    stats = storage.stats()
+    assert stats["bytes"] <= 1000
+    assert stats["items"] < 50
+    assert stats["covered_since"] > timestamp - 1
+    assert len(list(storage.fetch_items(timestamp - 1))) == 50
+    assert storage.stats()["storage_fetches"] == 1
@@ -0,0 +1,56 @@
+import random
+
+from mycollect.collectors.twitter_collector import TwitterCollector
+from mycollect.track_matcher import TrackMatcher
+
+
+def substring_best_track(track, text):
+    best_track = None
+    text = text.lower()
+    for search in track:
+        words = search.split()
+        if all(word in text for word in words):
+            if best_track is None or len(best_track.split()) < len(words):
+                best_track = search
+    return best_track
+
+
+def test_best_track():
+    track, filters = TwitterCollector.parse_track(
+        ["free steam", "free steam game", "steam game -key", "python"])
+    matcher = TrackMatcher(track, filters)
+    assert matcher.best_track("A FREE Steam game to grab") == "free steam game"
+    assert matcher.best_track("steamgames for free") == "free steam game"
+    assert matcher.best_track("Pythonic code") == "python"
+    assert matcher.best_track("nothing here") is None
+    assert matcher.match_filter("steam game", "Steam game KEYS giveaway")
+    assert not matcher.match_filter("steam game", "Steam game")
+    assert not matcher.match_filter("python", "python key")
+
+
+def test_first_track_wins_ties():
+    matcher = TrackMatcher(*TwitterCollector.parse_track(["red car", "car red", "blue car"]))
+    assert matcher.best_track("a red car and a blue car") == "red car"
+
+
+def test_resolve():
+    track, filters = TwitterCollector.parse_track(["drone -toy", "drone race"])
+    matcher = TrackMatcher(track, filters)
+    assert matcher.resolve("Drone toy sale", "Drone toy sale") == ("drone", True)
+    # the filters only apply to the filtered text
+    assert matcher.resolve("Drone sale https://toy.com", "Drone sale") == ("drone", False)
+    assert matcher.resolve("drone race toy", "drone race toy") == ("drone race", False)
+    assert matcher.resolve("Drone toy", "other toy") == ("drone", True)
+    assert matcher.resolve("nothing", "nothing") == (None, False)
+
+
+def test_same_as_substring_search():
+    generator = random.Random(42)
+    words = ["ab", "abc", "bc", "cab", "b", "ca", "bca"]
+    for _ in range(200):
+        track = [" ".join(generator.choices(words, k=generator.randint(1, 3)))
+                 for _ in range(generator.randint(1, 6))]
+        matcher = TrackMatcher(track, {})
+        for _ in range(10):
+            text = "".join(generator.choices("abcAB ", k=generator.randint(0, 12)))
+            assert matcher.best_track(text) == substring_best_track(track, text)
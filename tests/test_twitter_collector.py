@@ -47,11 +47,14 @@ def test_get_raw_data():
         "twitter.com"
     ], ["drone"])
 
-    def on_callback(item):
-        assert item
-    collector.set_callback(on_callback)
+    items = []
+    collector.set_callback(items.append)
     sample_tweet = ''.join(open("tests/test_files/sample_tweet.json"))
     assert collector.on_data(sample_tweet)
+    collector.stop()
+    assert len(items) == 1
+    assert items[0].category == "drone"
+    assert items[0].url == "https://store.steampowered.com/app/1243130/Nimbatus__Drone_Creator/"
 
 
 def test_parse_track():
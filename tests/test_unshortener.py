@@ -0,0 +1,139 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from mycollect.structures import MyCollectItem
+from mycollect.unshortener import AsyncUnshortener, Unshortener
+
+
+class RedirectHandler(BaseHTTPRequestHandler):
+
+    requests = []
+
+    def do_HEAD(self):
+        RedirectHandler.requests.append(("HEAD", self.path))
+        if self.path == "/no-head":
+            self.send_response(405)
+        elif self.path == "/short":
+            self.send_response(301)
+            self.send_header("Location", "/temporary")
+        elif self.path == "/temporary":
+            self.send_response(302)
+            self.send_header("Location", "/final")
+        else:
+            self.send_response(200)
+        self.end_headers()
+
+    def do_GET(self):
+        RedirectHandler.requests.append(("GET", self.path))
+        self.send_response(301)
+        self.send_header("Location", "/final")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def redirect_server():
+    RedirectHandler.requests = []
+    server = HTTPServer(("127.0.0.1", 0), RedirectHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+
+
+def test_unshorten(redirect_server):
+    unshortener = Unshortener(shorteners=["127.0.0.1"])
+    assert unshortener.unshorten(redirect_server + "/short") == redirect_server + "/temporary"
+    assert RedirectHandler.requests == [("HEAD", "/short"), ("HEAD", "/temporary"),
+                                        ("HEAD", "/final")]
+    assert unshortener.unshorten(redirect_server + "/short") == redirect_server + "/temporary"
+    assert len(RedirectHandler.requests) == 3
+    assert unshortener.unshorten(redirect_server + "/no-head") == redirect_server + "/final"
+    assert ("GET", "/no-head") in RedirectHandler.requests
+    assert unshortener.stats() == {"resolved": 2, "cache_hits": 1, "skipped": 0}
+
+
+def test_skip_not_shortened(redirect_server):
+    unshortener = Unshortener()
+    assert unshortener.unshorten(redirect_server + "/short") == redirect_server + "/short"
+    assert not RedirectHandler.requests
+    assert unshortener.is_shortened("https://t.co/abc")
+    assert unshortener.is_shortened("https://www.bit.ly/abc")
+    assert not unshortener.is_shortened("https://www.google.fr")
+
+
+def test_async_unshortener(redirect_server):
+    emitted = []
+    resolver = AsyncUnshortener(Unshortener(shorteners=["127.0.0.1"]), emitted.append, workers=2)
+    for index in range(10):
+        resolver.submit(MyCollectItem("twitter", "drone", str(index), redirect_server + "/short"))
+    resolver.close()
+    assert sorted(item.text for item in emitted) == [str(index) for index in range(10)]
+    assert all(item.url == redirect_server + "/temporary" for item in emitted)
+    assert resolver.stats() == {"submitted": 10, "dropped": 0, "errors": 0, "pending": 0,
+                                "resolved": 0}
+
+
+def test_async_unshortener_errors():
+    emitted = []
+    resolver = AsyncUnshortener(Unshortener(shorteners=["127.0.0.1"], timeout=1),
+                                emitted.append, workers=0)
+    resolver.submit(MyCollectItem("twitter", "drone", "text", "http://127.0.0.1:1/short"))
+    assert emitted[0].url == "http://127.0.0.1:1/short"
+    assert resolver.stats()["errors"] == 1
+
+
+def test_async_unshortener_without_url():
+    emitted = []
+    resolver = AsyncUnshortener(Unshortener(shorteners=["127.0.0.1"]), emitted.append, workers=2)
+    resolver.submit(MyCollectItem("twitter", "drone", "text", None))
+    resolver.close()
+    assert len(emitted) == 1
+    assert emitted[0].url is None
+    assert resolver.stats()["errors"] == 0
+
+
+def test_async_unshortener_full_queue():
+    release = threading.Event()
+    emitted = []
+
+    class BlockingUnshortener(Unshortener):
+        def unshorten(self, url):
+            release.wait()
+            return url
+
+    resolver = AsyncUnshortener(BlockingUnshortener(), emitted.append, workers=1, queue_size=1)
+    for index in range(5):
+        resolver.submit(MyCollectItem("twitter", "drone", str(index), "https://t.co/abc"))
+    release.set()
+    resolver.close()
+    stats = resolver.stats()
+    assert stats["dropped"] >= 3
+    assert len(emitted) == stats["submitted"] == 5 - stats["dropped"]
+
+
+def test_async_unshortener_slow_callback():
+    release = threading.Event()
+    emitted = []
+
+    def slow_callback(item):
+        release.wait()
+        emitted.append(item)
+
+    resolver = AsyncUnshortener(Unshortener(shorteners=[]), slow_callback, workers=2, queue_size=2)
+    for index in range(50):
+        resolver.submit(MyCollectItem("twitter", "drone", str(index), "https://example.com"))
+        time.sleep(0.001)
+    stats = resolver.stats()
+    # the callback holds one item, the resolved queue two, each worker one and the pending queue two
+    assert stats["resolved"] <= 2
+    assert stats["submitted"] <= 7
+    assert stats["dropped"] == 50 - stats["submitted"]
+    release.set()
+    resolver.close()
+    assert len(emitted) == stats["submitted"]
@@ -1,5 +1,11 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
 
-from mycollect.processors.url_grabber_processor import UrlGrabberProcessor
+import pytest
+
+from mycollect.processors import PipelineProcessor, Processor
+from mycollect.processors.url_grabber_processor import HostQueue, UrlGrabberProcessor, USER_AGENT
 from mycollect.structures import MyCollectItem
 
 def test_grab_url():
@@ -10,4 +16,256 @@ def test_grab_url():
     item.url = "https://fr.wikipedia.org/wiki/Lille"
     updated = processor.update_item(item)
     assert "article" in updated.extra
-    assert updated.extra["article"]["title"] == "Lille — Wikipédia"
\ No newline at end of file
+    assert updated.extra["article"]["title"] == "Lille — Wikipédia"
+
+
+class ArticleHandler(BaseHTTPRequestHandler):
+
+    requests = []
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with ArticleHandler.lock:
+            ArticleHandler.requests.append(self.path)
+            ArticleHandler.active += 1
+            ArticleHandler.max_active = max(ArticleHandler.max_active, ArticleHandler.active)
+        time.sleep(0.05)
+        with ArticleHandler.lock:
+            ArticleHandler.active -= 1
+        if self.path.startswith("/protected") and self.headers["User-Agent"] == USER_AGENT:
+            self.send_response(403)
+            self.end_headers()
+            return
+        if self.path.startswith("/forbidden"):
+            self.send_response(403)
+            self.end_headers()
+            return
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.path == "/document.pdf":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.end_headers()
+            self.wfile.write(b"%PDF-1.4" * 1000)
+            return
+        if self.path.startswith("/huge"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            if self.path == "/huge-declared":
+                self.send_header("Content-Length", str(200000))
+            self.end_headers()
+            self.wfile.write(b"<html><body>" + b"<p>text</p>" * 20000)
+            return
+        body = ("<html><head><title>Article " + self.path[1:].split("?")[0].strip("/") + "</title></head><body>"
+                + "<p>Some text of the article.</p>" * 20 + "</body></html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def article_server():
+    ArticleHandler.requests = []
+    ArticleHandler.max_active = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArticleHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+
+
+def test_negative_cache(article_server, tmp_path):
+    processor = UrlGrabberProcessor(working_folder=str(tmp_path), host_failures=2)
+    for _ in range(3):
+        item = processor.update_item(MyCollectItem(url=article_server + "/missing"))
+        assert "article" not in item.extra
+    assert len(ArticleHandler.requests) == 1
+    processor.update_item(MyCollectItem(url=article_server + "/missing-other"))
+    processor.update_item(MyCollectItem(url=article_server + "/missing-third"))
+    assert len(ArticleHandler.requests) == 2
+    stats = processor.stats()
+    assert stats["skipped_urls"] == 2
+    assert stats["skipped_hosts"] == 1
+    assert stats["failures"] == 2
+
+
+class CollectProcessor(Processor):
+
+    def __init__(self):
+        self.items = []
+
+    def update_item(self, item):
+        self.items.append(item)
+        return item
+
+
+def test_concurrent_grab(article_server, tmp_path):
+    pipeline = PipelineProcessor()
+    pipeline.append_processor(UrlGrabberProcessor(working_folder=str(tmp_path), workers=4,
+                                                  host_concurrency=1, host_rate=0))
+    collect = CollectProcessor()
+    pipeline.append_processor(collect)
+    for index in range(8):
+        assert pipeline.update_item(MyCollectItem(url=f"{article_server}/{index}")) is None
+    pipeline.update_item(MyCollectItem(url=""))
+    pipeline.close()
+    assert len(collect.items) == 9
+    titles = sorted(item.extra["article"]["title"] for item in collect.items if item.url)
+    assert titles == sorted(f"Article {index}" for index in range(8))
+    assert ArticleHandler.max_active == 1
+
+
+def test_coalesced_grab(article_server, tmp_path):
+    pipeline = PipelineProcessor()
+    processor = UrlGrabberProcessor(working_folder=str(tmp_path), workers=4,
+                                    host_concurrency=4, host_rate=0)
+    pipeline.append_processor(processor)
+    collect = CollectProcessor()
+    pipeline.append_processor(collect)
+    for _ in range(8):
+        pipeline.update_item(MyCollectItem(url=f"{article_server}/trending"))
+    pipeline.close()
+    assert ArticleHandler.requests == ["/trending"]
+    assert all(item.extra["article"]["title"] == "Article trending" for item in collect.items)
+    stats = processor.stats()
+    assert stats["downloads"] == 1
+    assert stats["coalesced"] >= 3
+
+
+def test_canonical_cache_keys(article_server, tmp_path):
+    processor = UrlGrabberProcessor(working_folder=str(tmp_path))
+    for url in ["/shared?utm_source=twitter", "/shared/", "/shared#top"]:
+        item = processor.update_item(MyCollectItem(url=article_server + url))
+        assert item.extra["article"]["title"] == "Article shared"
+    assert len(ArticleHandler.requests) == 1
+
+
+def test_parse_workers(article_server, tmp_path):
+    processor = UrlGrabberProcessor(working_folder=str(tmp_path), parse_workers=1)
+    item = processor.update_item(MyCollectItem(url=article_server + "/parsed"))
+    processor.close()
+    assert item.extra["article"]["title"] == "Article parsed"
+    assert "Some text of the article." in item.extra["article"]["text"]
+    stats = processor.stats()
+    assert stats["parsed"] == 1
+    assert stats["parse_bytes"] > 600
+    assert stats["parse_seconds"] > 0
+    assert stats["queue_seconds"] >= 0
+    assert 0 < stats["transfer_seconds"] < 1
+
+
+def test_aborted_downloads(article_server, tmp_path):
+    processor = UrlGrabberProcessor(working_folder=str(tmp_path), max_bytes=100000)
+    for url in ["/document.pdf", "/huge", "/huge-declared", "/document.pdf"]:
+        item = processor.update_item(MyCollectItem(url=article_server + url))
+        assert "article" not in item.extra
+    item = processor.update_item(MyCollectItem(url=article_server + "/small"))
+    assert item.extra["article"]["title"] == "Article small"
+    stats = processor.stats()
+    assert stats["aborted_content_type"] == 1
+    assert stats["aborted_size"] == 2
+    assert stats["skipped_urls"] == 1
+    assert stats["skipped_hosts"] == 0
+
+
+def test_host_queue():
+    host_queue = HostQueue(host_concurrency=2, host_rate=10)
+    for index in range(3):
+        host_queue.put("slow.com", MyCollectItem(text=str(index)))
+    host_queue.put("fast.com", MyCollectItem(text="fast"))
+    host_queue.close()
+    start = time.monotonic()
+    assert host_queue.get()[0] == "slow.com"
+    assert host_queue.get()[0] == "fast.com"
+    host, item = host_queue.get()
+    assert host == "slow.com" and item.text == "1"
+    assert time.monotonic() - start >= 0.09
+    host_queue.done("slow.com")
+    host_queue.done("slow.com")
+    assert host_queue.get()[1].text == "2"
+    assert host_queue.get() is None
+
+
+def test_host_queue_rate_between_items():
+    host_queue = HostQueue(host_concurrency=1, host_rate=10)
+    start = time.monotonic()
+    for index in range(3):
+        host_queue.put("example.com", MyCollectItem(text=str(index)))
+        assert host_queue.get()[1].text == str(index)
+        host_queue.done("example.com")
+    assert time.monotonic() - start >= 0.19
+
+
+def test_cached_grabs_skip_host_queue(article_server, tmp_path):
+    pipeline = PipelineProcessor()
+    processor = UrlGrabberProcessor(working_folder=str(tmp_path), workers=2,
+                                    host_concurrency=1, host_rate=0.2)
+    pipeline.append_processor(processor)
+    collect = CollectProcessor()
+    pipeline.append_processor(collect)
+    start = time.monotonic()
+    for _ in range(5):
+        pipeline.update_item(MyCollectItem(url=f"{article_server}/popular"))
+    while len(collect.items) < 5:
+        time.sleep(0.01)
+    for _ in range(5):
+        pipeline.update_item(MyCollectItem(url=f"{article_server}/popular?utm_source=x"))
+    pipeline.close()
+    # a second download of the host would wait for 5 seconds
+    assert time.monotonic() - start < 2
+    assert len(collect.items) == 10
+    assert all(item.extra["article"]["title"] == "Article popular" for item in collect.items)
+    assert ArticleHandler.requests == ["/popular"]
+    stats = processor.stats()
+    assert stats["downloads"] == 1
+    assert stats["coalesced"] == 4
+
+
+def test_completed_queue_backpressure(tmp_path):
+    release = threading.Event()
+    forwarded = []
+
+    def slow_forward(item):
+        release.wait()
+        forwarded.append(item)
+
+    processor = UrlGrabberProcessor(working_folder=str(tmp_path), workers=1, queue_size=2)
+    processor.set_forward(slow_forward)
+    submitted = []
+
+    def submit():
+        for index in range(10):
+            # invalid urls are completed at once
+            processor.update_item(MyCollectItem(category=str(index), url="invalid"))
+            submitted.append(index)
+
+    thread = threading.Thread(target=submit, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    # one item held by the forward, two waiting, the caller blocked on the next one
+    assert len(submitted) == 3
+    release.set()
+    thread.join()
+    processor.close()
+    assert [item.category for item in forwarded] == [str(index) for index in range(10)]
+
+
+def test_forbidden_fallback(article_server, tmp_path):
+    processor = UrlGrabberProcessor(working_folder=str(tmp_path))
+    item = processor.update_item(MyCollectItem(url=article_server + "/protected"))
+    assert item.extra["article"]["title"] == "Article protected"
+    assert ArticleHandler.requests == ["/protected", "/protected"]
+    assert processor.stats()["failures"] == 0
+    item = processor.update_item(MyCollectItem(url=article_server + "/forbidden"))
+    assert "article" not in item.extra
+    assert ArticleHandler.requests[2:] == ["/forbidden", "/forbidden"]
+    assert processor.stats()["failures"] == 1